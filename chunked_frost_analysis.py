@@ -0,0 +1,97 @@
+import sys
+import time
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+from simulation_field import SimulationField, open_field, read_labelled_csv
+from frost_exceedance import frost_depths, frost_episodes, episode_summary
+from seasonal_cube import SeasonalCube
+
+
+def analyse_block(path, lo, hi):
+    """
+    Computes the partial results of time steps lo:hi of a field: frost
+    depths, surface temperatures and the per-depth temperature envelope
+    """
+    field = SimulationField(path)
+    values = np.asarray(field.values[lo:hi], dtype=np.float64)
+    return {
+        'lo': lo,
+        'frost_depth': frost_depths(values, field.depths),
+        'surface': values[:, np.argmin(field.depths)],
+        'min': np.nanmin(values, axis=0),
+        'max': np.nanmax(values, axis=0),
+        'sum': np.nansum(values, axis=0),
+        'count': np.sum(~np.isnan(values), axis=0),
+    }
+
+
+def analyse_field(field, thresholds, block_size=365, workers=1,
+                  progress=True):
+    """
+    Runs the frost analysis of a field block by block, in worker processes
+    if workers > 1, and combines the partial results. Peak memory is set by
+    block_size time steps per worker rather than the simulation length.
+    """
+    n = len(field.dates)
+    blocks = [(lo, min(lo + block_size, n)) for lo in range(0, n, block_size)]
+    frost = np.empty(n)
+    surface = np.empty(n)
+    low = np.full(len(field.depths), np.inf)
+    high = np.full(len(field.depths), -np.inf)
+    total = np.zeros(len(field.depths))
+    count = np.zeros(len(field.depths))
+
+    start = time.time()
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    if pool is not None:
+        parts = pool.map(analyse_block, [field.path] * len(blocks),
+                         *zip(*blocks))
+    else:
+        parts = (analyse_block(field.path, lo, hi) for lo, hi in blocks)
+
+    for i, part in enumerate(parts):
+        # Combine the partial results of each block as it arrives
+        lo = part['lo']
+        frost[lo:lo + len(part['frost_depth'])] = part['frost_depth']
+        surface[lo:lo + len(part['surface'])] = part['surface']
+        low = np.fmin(low, part['min'])
+        high = np.fmax(high, part['max'])
+        total += part['sum']
+        count += part['count']
+        if progress:
+            print(f"Block {i + 1}/{len(blocks)} done "
+                  f"({time.time() - start:.1f} s)")
+    if pool is not None:
+        pool.shutdown()
+
+    with np.errstate(invalid='ignore'):
+        envelope = pd.DataFrame({'Depth (m)': field.depths, 'Min (C)': low,
+                                 'Mean (C)': total / count, 'Max (C)': high})
+    episodes = frost_episodes(field.dates, frost, thresholds)
+    cube = SeasonalCube.from_series(field.dates, {'frost_depth': frost,
+                                                  'surface_temperature': surface})
+    return {'dates': field.dates, 'frost_depth': frost, 'envelope': envelope,
+            'episodes': episodes, 'cube': cube}
+
+
+if __name__ == "__main__":
+    file_path = sys.argv[1] if len(sys.argv) > 1 else \
+        'temperature_vs_depth_results_oygard_model_concrete_cahnnel_1995-2025.csv'
+    block_size = int(sys.argv[2]) if len(sys.argv) > 2 else 365
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else 1
+    memory_mb = float(sys.argv[4]) if len(sys.argv) > 4 else 256
+
+    # Location of top of water pipe
+    depth_water_pipe = 0.47  # in meters
+
+    field = open_field(file_path, read_labelled_csv, memory_mb=memory_mb)
+    results = analyse_field(field, [depth_water_pipe], block_size, workers)
+
+    print("\nTemperature envelope per depth:")
+    print(results['envelope'].to_string(index=False))
+    print("\nMaximum frost depth per frost season (Oct-Sep):")
+    print(results['cube'].yearly('frost_depth', by='season').to_string())
+    print("\nFrost episodes exceeding the water pipe depth ({}m):".format(depth_water_pipe))
+    print(episode_summary(results['episodes']).to_string(index=False))
@@ -0,0 +1,153 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+from scipy.spatial import Delaunay
+
+from frost_exceedance import frost_depths
+
+
+def convert_cross_section(csv_path, path, start_date='1995-01-01', dx=0.05,
+                          dy=0.05, chunk_len=365, skiprows=0,
+                          rows_per_read=2000):
+    """
+    Converts a cross-section export with one row per mesh node (x, y and
+    one temperature column per day) to time chunks on a regular x-y grid.
+    The export is read in blocks of rows into a node-major scratch memmap
+    and then interpolated chunk by chunk, so memory stays bounded.
+    """
+    os.makedirs(path, exist_ok=True)
+    reader = pd.read_csv(csv_path, sep=';', encoding='latin1', header=None,
+                         decimal=',', comment='%', skiprows=skiprows,
+                         chunksize=rows_per_read)
+
+    scratch_path = os.path.join(path, 'nodes.tmp')
+    nodes = []
+    with open(scratch_path, 'wb') as scratch_file:
+        for block in reader:
+            values = block.values.astype(np.float32)
+            nodes.append(values[:, :2])
+            scratch_file.write(values[:, 2:].tobytes())
+    n_times = values.shape[1] - 2
+
+    nodes = np.concatenate(nodes).astype(np.float64)
+    scratch = np.memmap(scratch_path, dtype=np.float32, mode='r',
+                        shape=(len(nodes), n_times))
+
+    # Regular grid covering the cross-section, y pointing upwards
+    x = np.arange(nodes[:, 0].min(), nodes[:, 0].max() + dx / 2, dx)
+    y = np.arange(nodes[:, 1].min(), nodes[:, 1].max() + dy / 2, dy)
+    gx, gy = np.meshgrid(x, y)
+    grid = np.column_stack([gx.ravel(), gy.ravel()])
+
+    # Triangulate once and reuse the barycentric weights for every chunk
+    tri = Delaunay(nodes)
+    simplex = tri.find_simplex(grid)
+    transform = tri.transform[simplex]
+    b = np.einsum('ijk,ik->ij', transform[:, :2], grid - transform[:, 2])
+    weights = np.column_stack([b, 1 - b.sum(axis=1)])
+    vertices = tri.simplices[simplex]
+    outside = simplex < 0
+
+    n_chunks = (n_times + chunk_len - 1) // chunk_len
+    for i in range(n_chunks):
+        t = slice(i * chunk_len, min((i + 1) * chunk_len, n_times))
+        block = np.asarray(scratch[:, t])
+        values = np.einsum('gv,gvt->tg', weights, block[vertices])
+        values[:, outside] = np.nan
+        chunk = values.reshape(-1, len(y), len(x))
+        np.save(os.path.join(path, f'chunk_{i:05d}.npy'),
+                chunk.astype(np.float32))
+        print(f"Chunk {i + 1}/{n_chunks} written")
+    del scratch
+    os.remove(scratch_path)
+
+    dates = (np.datetime64(start_date, 'D')
+             + np.arange(n_times).astype('timedelta64[D]'))
+    np.save(os.path.join(path, 'x.npy'), x)
+    np.save(os.path.join(path, 'y.npy'), y)
+    np.save(os.path.join(path, 'dates.npy'), dates)
+    with open(os.path.join(path, 'meta.json'), 'w') as f:
+        json.dump({'chunk_len': chunk_len, 'n_chunks': n_chunks,
+                   'shape': [n_times, len(y), len(x)]}, f)
+    return CrossSectionField(path)
+
+
+class CrossSectionField:
+    """
+    Temperature field over a cross-section (time, y, x) stored in time
+    chunks, with vectorized extraction of vertical profiles at any x
+    """
+    def __init__(self, path, surface=None):
+        self.path = path
+        with open(os.path.join(path, 'meta.json')) as f:
+            self.meta = json.load(f)
+        self.x = np.load(os.path.join(path, 'x.npy'))
+        self.y = np.load(os.path.join(path, 'y.npy'))
+        self.dates = np.load(os.path.join(path, 'dates.npy'))
+        # Depths are measured downwards from the top of the cross-section
+        self.surface = self.y.max() if surface is None else surface
+        self.depths = self.surface - self.y[::-1]
+
+    def chunk(self, i):
+        return np.load(os.path.join(self.path, f'chunk_{i:05d}.npy'),
+                       mmap_mode='r')
+
+    def chunks(self, start=None, end=None):
+        """
+        Yields (time slice, chunk array) for the chunks overlapping a date
+        range, trimmed to the range
+        """
+        lo = 0 if start is None else np.searchsorted(
+            self.dates, np.datetime64(start, 'D'), side='left')
+        hi = len(self.dates) if end is None else np.searchsorted(
+            self.dates, np.datetime64(end, 'D'), side='right')
+        n = self.meta['chunk_len']
+        for i in range(lo // n, -(-hi // n) if hi > lo else 0):
+            first = i * n
+            a, b = max(lo, first) - first, min(hi, first + n) - first
+            yield slice(first + a, first + b), self.chunk(i)[a:b]
+
+    def profiles(self, x_positions, start=None, end=None):
+        """
+        Returns the dates, the depths and the temperatures interpolated at
+        the given x positions as a (time, position, depth) array
+        """
+        x_positions = np.atleast_1d(np.asarray(x_positions, dtype=np.float64))
+        hi = np.clip(np.searchsorted(self.x, x_positions), 1, len(self.x) - 1)
+        lo = hi - 1
+        w = np.clip((x_positions - self.x[lo]) / (self.x[hi] - self.x[lo]),
+                    0, 1)
+
+        parts = []
+        rows = []
+        for t, chunk in self.chunks(start, end):
+            # (time, y, position), flipped so that depth increases downwards
+            values = (1 - w) * chunk[:, ::-1, lo] + w * chunk[:, ::-1, hi]
+            parts.append(values.transpose(0, 2, 1))
+            rows.append(t)
+        dates = self.dates[rows[0].start:rows[-1].stop] if rows else self.dates[:0]
+        return dates, self.depths, np.concatenate(parts) if parts else \
+            np.empty((0, len(x_positions), len(self.depths)), np.float32)
+
+    def frost_fronts(self, x_positions, start=None, end=None):
+        """
+        Returns the dates and the frost penetration depth at the given x
+        positions as a (time, position) array
+        """
+        dates, depths, values = self.profiles(x_positions, start, end)
+        return dates, frost_depths(values, depths)
+
+
+def open_cross_section(csv_path, **kwargs):
+    """
+    Opens the chunked form of a cross-section export, converting the csv
+    file the first time or whenever it is newer than its chunked form
+    """
+    path = os.path.splitext(csv_path)[0] + '.xsection'
+    meta = os.path.join(path, 'meta.json')
+    if (not os.path.exists(meta)
+            or os.path.getmtime(meta) < os.path.getmtime(csv_path)):
+        print(f"Converting {csv_path} to chunked form...")
+        return convert_cross_section(csv_path, path, **kwargs)
+    return CrossSectionField(path)
@@ -0,0 +1,258 @@
+import os
+import sys
+import glob
+import numpy as np
+import pandas as pd
+from math import gamma
+from concurrent.futures import ProcessPoolExecutor
+
+from seasonal_cube import season_index
+from frost_exceedance import frost_depths
+from simulation_field import open_field, read_profile_csv
+from series_quality import read_met_daily, read_frost_daily, complete_daily
+
+euler_gamma = 0.5772156649015329
+gamma_function = np.vectorize(gamma, otypes=[np.float64])
+
+
+def season_labels(years):
+    return [f'{y}/{(y + 1) % 100:02d}' for y in years]
+
+
+def annual_maxima(dates, values, min_days=300):
+    """
+    Returns the maximum of each column of a (time, series) array per frost
+    season (October to September). Seasons with fewer than min_days values
+    are left NaN, so that incomplete first and last seasons do not bias the
+    fit.
+    """
+    values = np.asarray(values, dtype=np.float64).reshape(len(dates), -1)
+    years, _ = season_index(dates)
+    first = years.min()
+    row = years - first
+    n_years = row.max() + 1
+
+    ok = ~np.isnan(values)
+    cols = np.broadcast_to(np.arange(values.shape[1]), values.shape)
+    rows = np.broadcast_to(row[:, None], values.shape)
+    maxima = np.full((n_years, values.shape[1]), -np.inf)
+    np.maximum.at(maxima, (rows[ok], cols[ok]), values[ok])
+    count = np.zeros(maxima.shape)
+    np.add.at(count, (rows[ok], cols[ok]), 1)
+    maxima[count < min_days] = np.nan
+    return pd.DataFrame(maxima, index=pd.Index(
+        season_labels(range(first, first + n_years)), name='season'))
+
+
+def freezing_index(temperatures, min_days=300):
+    """
+    Returns the air freezing index (degree days below 0 °C) of each frost
+    season for a DataFrame of daily mean temperatures, one column per
+    station: the largest drop of the cumulative degree-day curve within the
+    season. Missing days count as 0 °C.
+    """
+    temperatures = complete_daily(temperatures)
+    years, _ = season_index(temperatures.index)
+    cumulative = temperatures.fillna(0).groupby(years).cumsum()
+    drop = cumulative.groupby(years).cummax() - cumulative
+    index = drop.groupby(years).max()
+    count = temperatures.notna().groupby(years).sum()
+    index = index.where(count >= min_days)
+    index.index = pd.Index(season_labels(index.index), name='season')
+    return index
+
+
+def l_moments(sample):
+    """
+    Returns the first three sample L-moments of every column of a sample
+    array (observations along axis 0, any trailing shape). NaN values are
+    skipped, so columns may have different lengths.
+    """
+    x = np.sort(sample, axis=0)  # NaN values sort last
+    n = np.sum(~np.isnan(x), axis=0)
+    j = np.arange(x.shape[0]).reshape((-1,) + (1,) * (x.ndim - 1))
+    x = np.nan_to_num(x)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        # Unbiased probability weighted moments b0, b1, b2
+        b0 = x.sum(axis=0) / n
+        b1 = (j * x).sum(axis=0) / (n * (n - 1))
+        b2 = (j * (j - 1) * x).sum(axis=0) / (n * (n - 1) * (n - 2))
+    return b0, 2 * b1 - b0, 6 * b2 - 6 * b1 + b0
+
+
+def fit_gumbel(l1, l2, l3=None):
+    """
+    Returns the location, scale and shape (zero) of Gumbel distributions
+    from L-moments
+    """
+    scale = l2 / np.log(2)
+    return l1 - euler_gamma * scale, scale, np.zeros_like(scale)
+
+
+def fit_gev(l1, l2, l3):
+    """
+    Returns the location, scale and shape k of GEV distributions from
+    L-moments (Hosking, 1985). k > 0 gives a bounded upper tail.
+    """
+    with np.errstate(invalid='ignore', divide='ignore'):
+        c = 2 / (3 + l3 / l2) - np.log(2) / np.log(3)
+        k = 7.8590 * c + 2.9554 * c ** 2
+        # Use the Gumbel limit where k is practically zero
+        k = np.where(np.abs(k) < 1e-6, 0.0, k)
+        g = gamma_function(1 + k)
+        scale = np.where(k == 0, l2 / np.log(2),
+                         l2 * k / ((1 - 2 ** -k) * g))
+        loc = np.where(k == 0, l1 - euler_gamma * scale,
+                       l1 - scale * (1 - g) / k)
+    return loc, scale, k
+
+
+def quantiles(loc, scale, k, probabilities):
+    """
+    Returns the quantiles of GEV distributions (Gumbel where k == 0) for
+    non-exceedance probabilities, shape (probabilities, ...)
+    """
+    p = np.asarray(probabilities).reshape((-1,) + (1,) * np.ndim(loc))
+    y = -np.log(-np.log(p))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        gev = loc + scale * (1 - np.exp(-k * y)) / k
+    return np.where(k == 0, loc + scale * y, gev)
+
+
+distributions = {'Gumbel': fit_gumbel, 'GEV': fit_gev}
+
+
+def fit_block(maxima, return_periods, n_boot=1000, confidence=0.9, seed=0):
+    """
+    Fits all distributions to each column of a (years, series) array of
+    annual maxima and returns the parameters, return levels and bootstrap
+    confidence limits, all series and resamples at once
+    """
+    probabilities = 1 - 1 / np.asarray(return_periods, dtype=np.float64)
+    x = np.sort(maxima, axis=0)
+    n = np.sum(~np.isnan(x), axis=0)
+
+    # Resample each series with replacement from its own valid years, the
+    # positions beyond its length are left NaN
+    rng = np.random.default_rng(seed)
+    picks = (rng.random((x.shape[0], n_boot, x.shape[1])) * n).astype(np.intp)
+    resampled = np.take_along_axis(x[:, None, :],
+                                   np.minimum(picks, x.shape[0] - 1), axis=0)
+    resampled = np.where(np.arange(x.shape[0])[:, None, None] < n,
+                         resampled, np.nan)
+
+    moments = l_moments(x)
+    boot_moments = l_moments(resampled)
+    alpha = (1 - confidence) / 2
+    results = {}
+    for name, fit in distributions.items():
+        params = fit(*moments)
+        levels = quantiles(*params, probabilities)
+        boot = quantiles(*fit(*boot_moments), probabilities)
+        low, high = np.nanquantile(boot, [alpha, 1 - alpha], axis=1)
+        results[name] = {'params': params, 'levels': levels,
+                         'lower': low, 'upper': high}
+    results['years'] = n
+    return results
+
+
+def return_period_table(maxima, return_periods=(50, 100), n_boot=1000,
+                        confidence=0.9, workers=1, block_size=50, seed=0):
+    """
+    Fits Gumbel and GEV distributions to every column of a DataFrame of
+    annual maxima and returns one row per series, distribution and return
+    period with the return level and its bootstrap confidence interval.
+    Blocks of block_size series are fitted in worker processes if workers
+    > 1.
+    """
+    values = maxima.to_numpy(dtype=np.float64)
+    blocks = [(lo, min(lo + block_size, values.shape[1]))
+              for lo in range(0, values.shape[1], block_size)]
+    args = [(values[:, lo:hi], return_periods, n_boot, confidence, seed + i)
+            for i, (lo, hi) in enumerate(blocks)]
+    if workers > 1 and len(blocks) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = list(pool.map(fit_block, *zip(*args)))
+    else:
+        parts = [fit_block(*a) for a in args]
+
+    tables = []
+    for (lo, hi), part in zip(blocks, parts):
+        series = np.asarray(maxima.columns[lo:hi])
+        for name in distributions:
+            result = part[name]
+            loc, scale, k = result['params']
+            for i, period in enumerate(return_periods):
+                tables.append(pd.DataFrame({
+                    'Series': series,
+                    'Distribution': name,
+                    'Years': part['years'],
+                    'Location': loc,
+                    'Scale': scale,
+                    'Shape': k,
+                    'Return period (years)': period,
+                    'Return level': result['levels'][i],
+                    'Lower': result['lower'][i],
+                    'Upper': result['upper'][i],
+                }))
+    table = pd.concat(tables, ignore_index=True)
+    return table.sort_values(['Series', 'Distribution', 'Return period (years)'],
+                             kind='stable', ignore_index=True)
+
+
+def frost_depth_maxima(files, min_days=300):
+    """
+    Returns the annual maximum frost depth per season of each simulation
+    profile export, one column per file
+    """
+    columns = {}
+    for file in files:
+        field = open_field(file, read_profile_csv)
+        depth = frost_depths(field.values, field.depths)
+        # No frost on a day with a simulated profile counts as zero depth
+        valid = ~np.all(np.isnan(np.asarray(field.values)), axis=1)
+        depth = np.where(valid, np.nan_to_num(depth), np.nan)
+        columns[os.path.basename(file)] = annual_maxima(field.dates, depth,
+                                                        min_days)[0]
+    return pd.DataFrame(columns)
+
+
+if __name__ == "__main__":
+    files = sys.argv[1:] or [
+        'temperature_vs_depth_results_profile_x=5.0_oygard_model_concrete_channel_1995-2025.csv',
+        'temperature_vs_depth_results_profile_x=4.8_oygard_model_concrete_channel_1995-2025.csv',
+        'temperature_vs_depth_results_profile_x=4.4_oygard_model_concrete_channel_1995-2025.csv',
+    ]
+    workers = os.cpu_count() or 1
+    tables = []
+
+    existing = [file for file in files if os.path.exists(file)]
+    for file in set(files) - set(existing):
+        print(f"Warning: File {file} not found")
+    if existing:
+        maxima = frost_depth_maxima(existing)
+        print("Annual maximum frost depth per season (m):")
+        print(maxima.to_string())
+        table = return_period_table(maxima, workers=workers)
+        table.insert(0, 'Variable', 'Frost depth (m)')
+        tables.append(table)
+
+    # Freezing index of the observed station series
+    stations = pd.DataFrame({
+        'Flesland': read_met_daily('Flesland_middeltemperatur_døgn_fra_1995.csv'),
+        'Øygarden': read_frost_daily(sorted(glob.glob(
+            'Øygarden_temperature_20??-??-??_to_*.csv'))),
+    })
+    index = freezing_index(stations)
+    print("\nFreezing index per season (°C days):")
+    print(index.round(1).to_string())
+    table = return_period_table(index, workers=workers)
+    table.insert(0, 'Variable', 'Freezing index (C days)')
+    tables.append(table)
+
+    table = pd.concat(tables, ignore_index=True)
+    table.to_csv('frost_return_periods.csv', index=False)
+    print("\nReturn levels with 90% bootstrap confidence intervals:")
+    print(table[['Variable', 'Series', 'Distribution', 'Years',
+                 'Return period (years)', 'Return level', 'Lower',
+                 'Upper']].round(2).to_string(index=False))
@@ -1,26 +1,28 @@
 import matplotlib.pyplot as plt
 
-def calculate_coordinates():
+# Trench dimensions in meters
+dimensions = {
+    "Width": 10,  # Assuming 'Width' refers to the total width based on point 1 and 2
+    "Height": 4,
+    "Asphalt_thickness": 0.14,
+    "Depth_of_trench": 1.5,
+    "Top_width_of_trench": 3,
+    "Bottom_width_of_trench": 1.5,
+    "Cushion_thickness": 0.1,
+    "Thickness_of_insulation": 0.05,
+    "Width_of_insulation": 0.8,
+    "Depth_of_pipe": 1.2,
+    "Pipe_diameter": 0.25,
+    "Distance_b_n_insulation_and_pipe": 0.1,
+}
+
+
+def calculate_coordinates(dimensions=dimensions):
     """
     Calculates the coordinates of points 1-18 on the sketch based on given dimensions.
     Assumes point 1 is at (0,0).
     """
 
-    dimensions = {
-        "Width": 10,  # Assuming 'Width' refers to the total width based on point 1 and 2
-        "Height": 4,
-        "Asphalt_thickness": 0.14,
-        "Depth_of_trench": 1.5,
-        "Top_width_of_trench": 3,
-        "Bottom_width_of_trench": 1.5,
-        "Cushion_thickness": 0.1,
-        "Thickness_of_insulation": 0.05,
-        "Width_of_insulation": 0.8,
-        "Depth_of_pipe": 1.2,
-        "Pipe_diameter": 0.25,
-        "Distance_b_n_insulation_and_pipe": 0.1,
-    }
-
     W = dimensions["Width"]
     H = dimensions["Height"]
     At = dimensions["Asphalt_thickness"]
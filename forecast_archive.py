@@ -0,0 +1,104 @@
+import os
+import csv
+import gzip
+import hashlib
+
+
+class ForecastArchive:
+    """
+    Append-only archive of forecast snapshots for one location. Every
+    snapshot is stored as a separate gzip member in one container file, and an
+    index file records its update time, offset, length and content hash.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.index_path = path + '.idx'
+        self.entries = []
+        if os.path.exists(self.index_path):
+            with open(self.index_path, newline='') as f:
+                for update_time, offset, length, digest in csv.reader(f):
+                    self.entries.append((update_time, int(offset),
+                                         int(length), digest))
+        self.hashes = {entry[3] for entry in self.entries}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def update_times(self):
+        return [entry[0] for entry in self.entries]
+
+    def append(self, content, update_time):
+        """
+        Appends a snapshot unless an identical one is already archived. Returns
+        True if the snapshot was added.
+        """
+        digest = hashlib.sha256(content).hexdigest()
+        if digest in self.hashes:
+            return False
+        frame = gzip.compress(content, mtime=0)
+        with open(self.path, 'ab') as f:
+            offset = f.tell()
+            f.write(frame)
+        # The index is written last, so a crash never indexes a partial frame
+        entry = (update_time, offset, len(frame), digest)
+        with open(self.index_path, 'a', newline='') as f:
+            csv.writer(f).writerow(entry)
+        self.entries.append(entry)
+        self.hashes.add(digest)
+        return True
+
+    def get(self, update_time):
+        """
+        Returns the latest snapshot archived with the given update time
+        """
+        for entry in reversed(self.entries):
+            if entry[0] == update_time:
+                with open(self.path, 'rb') as f:
+                    f.seek(entry[1])
+                    return gzip.decompress(f.read(entry[2]))
+        raise KeyError(update_time)
+
+    def replay(self):
+        """
+        Yields (update time, snapshot) for all snapshots in the order they were
+        archived, reading the container sequentially
+        """
+        if not self.entries:
+            return
+        with open(self.path, 'rb') as f:
+            for update_time, offset, length, _ in self.entries:
+                f.seek(offset)
+                yield update_time, gzip.decompress(f.read(length))
+
+
+def archive_path(directory, xml_filename):
+    """
+    Returns the archive path used for a forecast filename
+    """
+    return os.path.join(directory,
+                        os.path.splitext(xml_filename)[0] + '.snapshots')
+
+
+def import_snapshot_files(archive, paths, remove=False):
+    """
+    Moves loose <name>_<lastupdate>.xml snapshots into an archive, taking the
+    update time from the filename
+    """
+    added = 0
+    for path in sorted(paths):
+        update_time = os.path.basename(path)[:-4].rsplit('_', 1)[1]
+        with open(path, 'rb') as f:
+            added += archive.append(f.read(), update_time)
+        if remove:
+            os.remove(path)
+    return added
+
+
+if __name__ == "__main__":
+    import glob
+    xml_filename = 'Flornes_Hourly_Forecast.xml'
+    my_dir = os.path.dirname(os.path.abspath(__file__))
+    archive = ForecastArchive(archive_path(my_dir, xml_filename))
+    paths = glob.glob(os.path.join(my_dir, xml_filename[:-4] + '_*.xml'))
+    added = import_snapshot_files(archive, paths, remove=True)
+    print(f"Archived {added} of {len(paths)} snapshots, {len(archive)} in total")
@@ -0,0 +1,209 @@
+import os
+import sys
+import json
+import time
+import heapq
+import random
+import signal
+import threading
+import traceback
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import matplotlib
+matplotlib.use('Agg')
+
+from get_weather_forecast import WeatherData
+from locationforecast import LocationForecastData, api_url
+
+
+class ForecastDaemon:
+    """
+    Keeps a fleet of WeatherData objects resident and fetches each location
+    shortly after the update time announced in its feed. Due locations are
+    kept in a priority queue and fetched by a thread pool.
+    """
+    def __init__(self, locations, workers=4, jitter=120, min_interval=300,
+                 retry=300, max_retry=3600, plot=True):
+        self.locations = locations
+        self.jitter = jitter
+        self.min_interval = min_interval
+        self.retry = retry
+        self.max_retry = max_retry
+        self.plot = plot
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.queue = []
+        self.counter = 0
+        self.condition = threading.Condition()
+        # pyplot is not thread safe, plots are drawn one at a time
+        self.plot_lock = threading.Lock()
+        self.running = False
+        self.started = time.time()
+        self.metrics = {name: {'fetches': 0, 'failures': 0,
+                               'consecutive_failures': 0, 'last_success': None,
+                               'last_error': None, 'last_update': None,
+                               'next_due': None, 'lag': None, 'duration': None}
+                        for name in locations}
+        for name in locations:
+            self.schedule(name, time.time())
+
+    def schedule(self, name, due):
+        with self.condition:
+            self.metrics[name]['next_due'] = due
+            heapq.heappush(self.queue, (due, self.counter, name))
+            self.counter += 1
+            self.condition.notify()
+
+    def fetch(self, name, due):
+        """
+        Updates one location and schedules its next fetch
+        """
+        metrics = self.metrics[name]
+        start = time.time()
+        metrics['lag'] = start - due
+        metrics['fetches'] += 1
+        try:
+            weather = self.locations[name]
+            previous = weather.update_time
+            next_update = weather.update(plot=False)
+            # Backends may skip unchanged forecasts, plot only new ones
+            if self.plot and weather.update_time != previous:
+                with self.plot_lock:
+                    weather.plotWeatherData()
+        except Exception as e:
+            metrics['failures'] += 1
+            metrics['consecutive_failures'] += 1
+            metrics['last_error'] = f'{type(e).__name__}: {e}'
+            traceback.print_exc()
+            # Back off exponentially while the location keeps failing
+            delay = min(self.retry * 2 ** (metrics['consecutive_failures'] - 1),
+                        self.max_retry)
+            self.schedule(name, time.time() + delay)
+            return
+        finally:
+            metrics['duration'] = time.time() - start
+
+        metrics['consecutive_failures'] = 0
+        metrics['last_success'] = time.time()
+        metrics['last_update'] = weather.update_time
+        self.schedule(name, self.next_due(next_update))
+
+    def next_due(self, next_update):
+        """
+        Returns when to fetch next: shortly after the announced update, but
+        never sooner than min_interval from now
+        """
+        earliest = time.time() + self.min_interval
+        if next_update is None:
+            return earliest + random.uniform(0, self.jitter)
+        return max(next_update.timestamp(), earliest) + random.uniform(0, self.jitter)
+
+    def run(self):
+        """
+        Runs the event loop until stop() is called
+        """
+        self.running = True
+        while self.running:
+            with self.condition:
+                while self.running and (not self.queue
+                                        or self.queue[0][0] > time.time()):
+                    timeout = self.queue[0][0] - time.time() if self.queue else None
+                    self.condition.wait(timeout)
+                if not self.running:
+                    break
+                due, _, name = heapq.heappop(self.queue)
+                self.metrics[name]['next_due'] = None
+            self.pool.submit(self.fetch, name, due)
+        self.pool.shutdown(wait=True)
+
+    def stop(self, *args):
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+
+    def health(self):
+        """
+        Returns overall health and per location metrics
+        """
+        now = time.time()
+        locations = {}
+        for name, m in self.metrics.items():
+            locations[name] = dict(m)
+            if m['last_success'] is not None:
+                locations[name]['age'] = now - m['last_success']
+        healthy = all(m['consecutive_failures'] < 3 for m in self.metrics.values())
+        lags = [m['lag'] for m in self.metrics.values() if m['lag'] is not None]
+        return {'healthy': healthy,
+                'uptime': now - self.started,
+                'queued': len(self.queue),
+                'max_lag': max(lags) if lags else None,
+                'time': datetime.now(timezone.utc).isoformat(),
+                'locations': locations}
+
+    def serve_metrics(self, port):
+        """
+        Serves /health and /metrics as JSON on a background thread
+        """
+        daemon = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                report = daemon.health()
+                if self.path == '/health':
+                    body = {'healthy': report['healthy']}
+                    status = 200 if report['healthy'] else 503
+                elif self.path == '/metrics':
+                    body, status = report, 200
+                else:
+                    body, status = {'error': 'not found'}, 404
+                content = json.dumps(body, default=str).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(('', port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+def load_locations(config_file):
+    """
+    Reads a JSON list of locations, each with either url and xml_filename
+    (yr.no xml feed) or lat, lon and json_filename (locationforecast 2.0,
+    optionally with the url of the API), a csv_filename and optionally name
+    and data_dir
+    """
+    with open(config_file) as f:
+        config = json.load(f)
+    locations = {}
+    for loc in config:
+        if 'lat' in loc:
+            weather = LocationForecastData(loc['lat'], loc['lon'],
+                                           loc['json_filename'],
+                                           loc['csv_filename'],
+                                           loc.get('data_dir'),
+                                           loc.get('url', api_url))
+        else:
+            weather = WeatherData(loc['url'], loc['xml_filename'],
+                                  loc['csv_filename'], loc.get('data_dir'))
+        name = loc.get('name', os.path.splitext(weather.xml_filename)[0])
+        locations[name] = weather
+    return locations
+
+
+if __name__ == "__main__":
+    config_file = sys.argv[1] if len(sys.argv) > 1 else 'locations.json'
+    port = int(sys.argv[2]) if len(sys.argv) > 2 else 8765
+
+    daemon = ForecastDaemon(load_locations(config_file))
+    daemon.serve_metrics(port)
+    signal.signal(signal.SIGINT, daemon.stop)
+    signal.signal(signal.SIGTERM, daemon.stop)
+    print(f"Polling {len(daemon.locations)} locations, metrics on port {port}")
+    daemon.run()
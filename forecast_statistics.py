@@ -0,0 +1,286 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+# Columns of the forecast csv files written by WeatherData
+key_columns = ['From', 'To']
+value_columns = ['Min Precip. (mm)', 'Avg Precip. (mm)', 'Max Precip. (mm)',
+                 'Temp. (C)']
+
+# Fixed histogram bin edges; values outside end up in the first and last bin
+precipitation_edges = np.arange(0, 10.25, 0.25)
+temperature_edges = np.arange(-30, 36, 1.0)
+bin_edges = {column: precipitation_edges for column in value_columns[:3]}
+bin_edges['Temp. (C)'] = temperature_edges
+
+
+class QuantileDigest:
+    """
+    Mergeable quantile sketch in the style of a t-digest: values are kept as
+    weighted centroids, fine near the tails and coarse in the middle, so
+    that the size stays bounded by the compression regardless of how many
+    values were added
+    """
+    def __init__(self, compression=100, means=None, weights=None):
+        self.compression = compression
+        self.means = np.empty(0) if means is None else np.asarray(means, dtype=np.float64)
+        self.weights = np.empty(0) if weights is None else np.asarray(weights, dtype=np.float64)
+
+    def copy(self):
+        return QuantileDigest(self.compression, self.means.copy(),
+                              self.weights.copy())
+
+    def add(self, values, weights=None):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if weights is None:
+            weights = np.ones(len(values))
+        self.means = np.concatenate([self.means, values])
+        self.weights = np.concatenate([self.weights, weights])
+        self.compress()
+
+    def merge(self, other):
+        self.add(other.means, other.weights)
+
+    def compress(self):
+        """
+        Merges neighbouring centroids that fall in the same bin of the
+        arcsine scale function, in one vectorized pass
+        """
+        if len(self.means) <= self.compression:
+            order = np.argsort(self.means, kind='stable')
+            self.means, self.weights = self.means[order], self.weights[order]
+            return
+        order = np.argsort(self.means, kind='stable')
+        means, weights = self.means[order], self.weights[order]
+        total = weights.sum()
+        q = (np.cumsum(weights) - weights / 2) / total
+        k = self.compression / (2 * np.pi) * np.arcsin(2 * q - 1)
+        groups = np.floor(k).astype(np.int64)
+        _, groups = np.unique(groups, return_inverse=True)
+        merged = np.bincount(groups, weights)
+        self.means = np.bincount(groups, weights * means) / merged
+        self.weights = merged
+
+    def quantile(self, q):
+        """
+        Returns the approximate quantiles q (0-1) of the values added
+        """
+        if not len(self.means):
+            return np.full(np.shape(q), np.nan)
+        centres = (np.cumsum(self.weights) - self.weights / 2) / self.weights.sum()
+        return np.interp(q, centres, self.means)
+
+
+class Accumulator:
+    """
+    Running count, sum, min, max, fixed-edge histogram and quantile digest
+    of one variable
+    """
+    def __init__(self, edges, compression=100):
+        self.edges = np.asarray(edges, dtype=np.float64)
+        self.count = 0
+        self.total = 0.0
+        self.low = np.inf
+        self.high = -np.inf
+        self.histogram = np.zeros(len(self.edges) - 1, dtype=np.int64)
+        self.digest = QuantileDigest(compression)
+
+    def copy(self):
+        other = Accumulator(self.edges, self.digest.compression)
+        other.count, other.total = self.count, self.total
+        other.low, other.high = self.low, self.high
+        other.histogram = self.histogram.copy()
+        other.digest = self.digest.copy()
+        return other
+
+    def add(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return
+        self.count += len(values)
+        self.total += values.sum()
+        self.low = min(self.low, values.min())
+        self.high = max(self.high, values.max())
+        # Values outside the edges are counted in the outer bins
+        bins = np.clip(np.searchsorted(self.edges, values, side='right') - 1,
+                       0, len(self.histogram) - 1)
+        self.histogram += np.bincount(bins, minlength=len(self.histogram))
+        self.digest.add(values)
+
+    def arrays(self, prefix):
+        return {prefix + '/edges': self.edges,
+                prefix + '/summary': np.array([self.count, self.total,
+                                               self.low, self.high]),
+                prefix + '/histogram': self.histogram,
+                prefix + '/digest': np.stack([self.digest.means,
+                                              self.digest.weights])}
+
+    @classmethod
+    def from_arrays(cls, arrays, prefix, compression=100):
+        acc = cls(arrays[prefix + '/edges'], compression)
+        count, acc.total, acc.low, acc.high = arrays[prefix + '/summary']
+        acc.count = int(count)
+        acc.histogram = arrays[prefix + '/histogram'].astype(np.int64)
+        means, weights = arrays[prefix + '/digest']
+        acc.digest = QuantileDigest(compression, means, weights)
+        return acc
+
+    def summary(self, quantiles=(0.5, 0.9, 0.99)):
+        row = {'count': self.count,
+               'mean': self.total / self.count if self.count else np.nan,
+               'min': self.low if self.count else np.nan,
+               'max': self.high if self.count else np.nan}
+        for q, value in zip(quantiles, self.digest.quantile(quantiles)):
+            row[f'p{round(100 * q)}'] = value
+        return row
+
+
+class ForecastStatistics:
+    """
+    Persisted statistics of the cleaned forecast history of one location
+    (the latest forecast of every hour), updated with one forecast issue at
+    a time. Hours that can still be superseded by a later issue (the
+    latest issue and any newer hours) are kept as live rows; older hours
+    are settled into the accumulators. Summaries combine both, so their
+    cost does not depend on the length of the history.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.settled = {c: Accumulator(bin_edges[c]) for c in value_columns}
+        self.live = pd.DataFrame(columns=key_columns + value_columns)
+        if os.path.exists(path):
+            with np.load(path, allow_pickle=False) as npz:
+                arrays = {name: npz[name] for name in npz.files}
+            self.settled = {c: Accumulator.from_arrays(arrays, c)
+                            for c in value_columns}
+            self.live = pd.DataFrame({'From': arrays['live/From'],
+                                      'To': arrays['live/To']})
+            for i, c in enumerate(value_columns):
+                self.live[c] = arrays['live/values'][:, i]
+
+    def update(self, rows):
+        """
+        Adds the rows of a new forecast issue (From, To and the value
+        columns, as written to the csv file). Live rows the issue replaces
+        are dropped, live rows older than the issue are settled.
+        """
+        issue = pd.DataFrame(rows, columns=key_columns + value_columns)
+        issue[value_columns] = issue[value_columns].astype(np.float64)
+        issue = issue.drop_duplicates(subset=key_columns, keep='last')
+        first = issue['From'].min()
+
+        live = self.live.merge(issue[key_columns], on=key_columns, how='left',
+                               indicator=True)
+        kept = live[live['_merge'] == 'left_only'].drop(columns='_merge')
+        settle = kept[kept['From'] < first]
+        for c in value_columns:
+            self.settled[c].add(settle[c].to_numpy())
+        self.live = pd.concat([kept[kept['From'] >= first], issue],
+                              ignore_index=True)
+
+    def save(self):
+        arrays = {'live/From': self.live['From'].to_numpy(dtype=str),
+                  'live/To': self.live['To'].to_numpy(dtype=str),
+                  'live/values': self.live[value_columns].to_numpy(dtype=np.float64)}
+        for c in value_columns:
+            arrays.update(self.settled[c].arrays(c))
+        with open(self.path, 'wb') as f:
+            np.savez(f, **arrays)
+
+    def accumulators(self):
+        """
+        Returns the accumulators of the full cleaned history: the settled
+        ones with the live rows added
+        """
+        combined = {}
+        for c in value_columns:
+            combined[c] = self.settled[c].copy()
+            combined[c].add(self.live[c].to_numpy())
+        return combined
+
+    def summary(self):
+        """
+        Returns count, mean, min, max and quantiles of every variable
+        """
+        return pd.DataFrame({c: acc.summary()
+                             for c, acc in self.accumulators().items()}).T
+
+    def latest(self, n=48):
+        """
+        Returns the n latest forecast hours
+        """
+        return self.live.sort_values('From', kind='stable').tail(n)
+
+    @classmethod
+    def from_clean_csv(cls, clean_file, path, csv_file):
+        """
+        Builds the statistics from an existing cleaned csv file. The rows of
+        the latest issue, found in the raw csv file as the rows after the
+        last step back in From, and any newer hours are kept live.
+        """
+        stats = cls.__new__(cls)
+        stats.path = path
+        stats.settled = {c: Accumulator(bin_edges[c]) for c in value_columns}
+        starts = pd.read_csv(csv_file, usecols=['From'])['From'].to_numpy(dtype=str)
+        new_issue = np.flatnonzero(starts[1:] < starts[:-1]) + 1
+        first = starts[new_issue[-1]] if len(new_issue) else starts[0]
+
+        data = pd.read_csv(clean_file)
+        live = data['From'].to_numpy(dtype=str) >= first
+        for c in value_columns:
+            stats.settled[c].add(data.loc[~live, c].to_numpy())
+        stats.live = data.loc[live, key_columns + value_columns] \
+            .reset_index(drop=True)
+        return stats
+
+
+def consistency_check(stats, clean_file, tolerance=0.05):
+    """
+    Compares the incremental statistics with a full recompute from the
+    cleaned csv file. Counts and histograms must match exactly, min, max
+    and mean to a relative rounding tolerance (the csv holds parsed text)
+    and quantiles to within tolerance times the value range. Quantiles are
+    recomputed with the same midpoint definition as the digest and skipped
+    where fewer than 10 values lie above them, as the tail is not resolved
+    there. Returns a table with one row per variable and statistic.
+    """
+    data = pd.read_csv(clean_file)
+    rows = []
+    for c, acc in stats.accumulators().items():
+        full = Accumulator(bin_edges[c])
+        full.add(data[c].to_numpy())
+        values = data[c].dropna().to_numpy()
+        span = max(full.high - full.low, 1e-9)
+        scale = 1e-9 * max(abs(full.low), abs(full.high), 1.0)
+        checks = [('count', acc.count, full.count, 0),
+                  ('min', acc.low, full.low, scale),
+                  ('max', acc.high, full.high, scale),
+                  ('mean', acc.total / acc.count, values.mean(), scale),
+                  ('histogram', int(np.abs(acc.histogram - full.histogram).sum()),
+                   0, 0)]
+        for q in (0.5, 0.9, 0.99):
+            if len(values) * (1 - q) < 10:
+                continue
+            checks.append((f'p{round(100 * q)}', acc.digest.quantile(q),
+                           np.quantile(values, q, method='hazen'),
+                           tolerance * span))
+        for name, incremental, recomputed, allowed in checks:
+            rows.append({'variable': c, 'statistic': name,
+                         'incremental': incremental, 'recomputed': recomputed,
+                         'ok': abs(incremental - recomputed) <= allowed})
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    # Check the statistics of a location against its cleaned csv file
+    csv_filename = sys.argv[1] if len(sys.argv) > 1 else 'Flornes_Hourly_Data.csv'
+    data_dir = os.path.dirname(os.path.abspath(csv_filename))
+    stem = os.path.splitext(os.path.basename(csv_filename))[0]
+    stats = ForecastStatistics(os.path.join(data_dir, stem + '_Stats.npz'))
+    print(stats.summary().to_string())
+    report = consistency_check(stats, os.path.join(data_dir, stem + '_Clean.csv'))
+    print(report.to_string(index=False))
+    sys.exit(0 if report['ok'].all() else 1)
@@ -0,0 +1,206 @@
+import os
+import glob
+import json
+import numpy as np
+import pandas as pd
+import xml.etree.ElementTree as et
+
+from frost_observations import load_table
+from forecast_archive import ForecastArchive, archive_path
+from locationforecast import forecast_rows
+
+# Lead time buckets in hours, the last bucket is open ended
+lead_time_edges = [0, 6, 12, 24, 48, 72, 120, 240]
+
+
+def parse_forecast(content):
+    '''
+    Parses one yr.no forecast xml snapshot and returns its rows with the
+    issue time, all times converted to UTC
+    '''
+    if content.lstrip()[:1] == b'{':
+        return parse_locationforecast(content)
+    root = et.fromstring(content)
+    timezone = root.find('location').find('timezone')
+    offset = pd.Timedelta(minutes=int(timezone.get('utcoffsetMinutes', 0)))
+    issued = pd.Timestamp(root.find('meta').find('lastupdate').text) - offset
+
+    times = root.find('forecast').find('tabular').findall('time')
+    start = np.array([t.get('from') for t in times], dtype='datetime64[s]')
+    end = np.array([t.get('to') for t in times], dtype='datetime64[s]')
+    prcp = [t.find('precipitation').get('value') for t in times]
+    temp = [t.find('temperature').get('value') for t in times]
+
+    return pd.DataFrame({
+        'Issued': np.full(len(times), issued.to_datetime64(),
+                          dtype='datetime64[s]'),
+        'From': start - offset.to_timedelta64(),
+        'To': end - offset.to_timedelta64(),
+        'Precip': np.array(prcp, dtype=np.float32),
+        'Temp': np.array(temp, dtype=np.float32),
+    })
+
+
+def parse_locationforecast(content):
+    '''
+    Parses one locationforecast 2.0 JSON snapshot into the same rows as
+    parse_forecast
+    '''
+    forecast = json.loads(content)
+    issued = pd.Timestamp(forecast['properties']['meta']['updated_at'])
+    rows = forecast_rows(forecast)
+    start = pd.to_datetime([r[0] for r in rows]).tz_convert(None)
+    return pd.DataFrame({
+        'Issued': np.full(len(rows), issued.tz_convert(None).to_datetime64(),
+                          dtype='datetime64[s]'),
+        'From': start.values.astype('datetime64[s]'),
+        'To': (start + pd.Timedelta(hours=1)).values.astype('datetime64[s]'),
+        'Precip': np.array([r[3] for r in rows], dtype=np.float32),
+        'Temp': np.array([r[5] for r in rows], dtype=np.float32),
+    })
+
+
+def snapshot_files(xml_filename, directory='.'):
+    '''
+    Returns loose forecast snapshots named <name>_<lastupdate>.xml, as kept
+    before snapshots were stored in a ForecastArchive
+    '''
+    pattern = os.path.join(directory, xml_filename[:-4] + '_*.xml')
+    return sorted(glob.glob(pattern))
+
+
+def read_snapshots(paths):
+    '''
+    Yields the contents of snapshot files
+    '''
+    for path in paths:
+        with open(path, 'rb') as f:
+            yield f.read()
+
+
+def archived_snapshots(xml_filename, directory='.'):
+    '''
+    Yields the contents of all snapshots in the archive of a forecast
+    '''
+    archive = ForecastArchive(archive_path(directory, xml_filename))
+    for _, content in archive.replay():
+        yield content
+
+
+def load_forecast_issues(snapshots, location):
+    '''
+    Parses every forecast issue of a location into one table
+    '''
+    frames = [parse_forecast(content) for content in snapshots]
+    issues = pd.concat(frames, ignore_index=True)
+    issues.insert(0, 'Location', location)
+    return issues
+
+
+def interval_sums(times, values, starts, ends):
+    '''
+    Sums observations with times in (start, end] for every interval, using
+    cumulative sums and binary search instead of pairwise comparison.
+    Intervals containing a missing observation give NaN.
+    '''
+    order = np.argsort(times, kind='stable')
+    times = times[order]
+    values = values[order]
+    missing = np.isnan(values)
+    total = np.concatenate([[0], np.cumsum(np.where(missing, 0, values))])
+    gaps = np.concatenate([[0], np.cumsum(missing)])
+
+    lo = np.searchsorted(times, starts, side='right')
+    hi = np.searchsorted(times, ends, side='right')
+    sums = total[hi] - total[lo]
+    sums[(hi == lo) | (gaps[hi] != gaps[lo])] = np.nan
+    return sums
+
+
+def join_observations(forecasts, observations, temp_column='air_temperature',
+                      precip_column='sum(precipitation_amount PT1H)',
+                      tolerance='30min'):
+    '''
+    Matches every forecast row with observations of the same location.
+    Temperature is matched as-of the start of the interval and precipitation
+    is summed over the interval. observations maps location names to tables
+    from frost_observations.load_table.
+    '''
+    joined = []
+    for location, rows in forecasts.groupby('Location', sort=False):
+        obs = observations[location]
+        times = obs.index.tz_convert(None).values.astype('datetime64[s]')
+
+        rows = rows.sort_values('From', kind='stable')
+        rows['From'] = rows['From'].astype('datetime64[s]')
+        temp = pd.DataFrame({'From': times,
+                             'Temp. obs': obs[temp_column].values})
+        rows = pd.merge_asof(rows, temp.sort_values('From'), on='From',
+                             direction='nearest',
+                             tolerance=pd.Timedelta(tolerance))
+        rows['Precip. obs'] = interval_sums(
+            times, obs[precip_column].values.astype(np.float64),
+            rows['From'].values.astype('datetime64[s]'),
+            rows['To'].values.astype('datetime64[s]'))
+        joined.append(rows)
+    return pd.concat(joined, ignore_index=True)
+
+
+def verification_scores(joined, edges=lead_time_edges):
+    '''
+    Computes bias, MAE and RMSE of temperature and precipitation forecasts
+    by location and lead time bucket
+    '''
+    lead = (joined['From'] - joined['Issued']) / pd.Timedelta(hours=1)
+    labels = [f'{a}-{b}h' for a, b in zip(edges[:-1], edges[1:])]
+    labels.append(f'{edges[-1]}h+')
+    bucket = np.searchsorted(edges, lead.values, side='right') - 1
+    valid = bucket >= 0
+
+    scores = []
+    for name, forecast, observed in [('Temp. (C)', 'Temp', 'Temp. obs'),
+                                     ('Precip. (mm)', 'Precip',
+                                      'Precip. obs')]:
+        error = (joined[forecast].values.astype(np.float64)
+                 - joined[observed].values.astype(np.float64))
+        ok = valid & ~np.isnan(error)
+        errors = pd.DataFrame({'Location': joined['Location'].values[ok],
+                               'Lead time': bucket[ok],
+                               'error': error[ok],
+                               'abs': np.abs(error[ok]),
+                               'sq': error[ok] ** 2})
+        stats = errors.groupby(['Location', 'Lead time']).agg(
+            n=('error', 'size'), bias=('error', 'mean'),
+            mae=('abs', 'mean'), mse=('sq', 'mean')).reset_index()
+        stats['rmse'] = np.sqrt(stats.pop('mse'))
+        stats['Lead time'] = [labels[b] for b in stats['Lead time']]
+        stats.insert(1, 'Variable', name)
+        scores.append(stats)
+    return pd.concat(scores, ignore_index=True)
+
+
+if __name__ == "__main__":
+    # Forecast snapshots and hourly observations per location
+    locations = {
+        'Flornes': {
+            'xml_filename': 'Flornes_Hourly_Forecast.xml',
+            'observations_file': 'Flornes_observations_hourly.npz',
+        },
+    }
+
+    forecasts = []
+    observations = {}
+    for name, files in locations.items():
+        issues = load_forecast_issues(
+            archived_snapshots(files['xml_filename']), name)
+        print(f"{name}: {issues['Issued'].nunique()} forecast issues")
+        forecasts.append(issues)
+        observations[name] = load_table(
+            files['observations_file'],
+            columns=['air_temperature', 'sum(precipitation_amount PT1H)'])
+
+    joined = join_observations(pd.concat(forecasts, ignore_index=True),
+                               observations)
+    scores = verification_scores(joined)
+    print(scores.to_string(index=False))
+    scores.to_csv('forecast_verification_scores.csv', index=False)
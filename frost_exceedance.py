@@ -0,0 +1,116 @@
+import numpy as np
+import pandas as pd
+
+
+def frost_depths(temperatures, depths):
+    """
+    Returns the frost penetration depth of every profile in a (time, depth)
+    temperature array: the zero crossing below the deepest frozen point,
+    the largest depth if the whole profile is frozen and NaN without frost
+    """
+    temperatures = np.asarray(temperatures, dtype=np.float64)
+    depths = np.asarray(depths, dtype=np.float64)
+    n = temperatures.shape[-1]
+
+    frozen = temperatures <= 0
+    # Index of the deepest frozen point of each profile
+    last = n - 1 - np.argmax(frozen[..., ::-1], axis=-1)
+    below = np.minimum(last + 1, n - 1)
+    t1 = np.take_along_axis(temperatures, last[..., None], axis=-1)[..., 0]
+    t2 = np.take_along_axis(temperatures, below[..., None], axis=-1)[..., 0]
+    d1, d2 = depths[last], depths[below]
+
+    # Linear interpolation between the last frozen and first unfrozen point
+    with np.errstate(divide='ignore', invalid='ignore'):
+        crossing = np.where(last == n - 1, d1,
+                            d1 + (0 - t1) * (d2 - d1) / (t2 - t1))
+
+    has_frost = np.nanmin(temperatures, axis=-1) < 0
+    all_frozen = np.nanmax(temperatures, axis=-1) < 0
+    return np.where(all_frozen, depths.max(),
+                    np.where(has_frost, crossing, np.nan))
+
+
+def run_lengths(mask):
+    """
+    Returns the start and end (exclusive) indices of the runs of True
+    values along the last axis, together with the row of each run
+    """
+    mask = np.atleast_2d(mask).astype(np.int8)
+    padded = np.zeros((mask.shape[0], mask.shape[1] + 2), dtype=np.int8)
+    padded[:, 1:-1] = mask
+    steps = np.diff(padded, axis=1)
+    rows, starts = np.nonzero(steps == 1)
+    _, ends = np.nonzero(steps == -1)
+    return rows, starts, ends
+
+
+def frost_season(dates):
+    """
+    Returns the frost season (October to September) of each date, labelled
+    by the years it spans, e.g. '1995/96'
+    """
+    dates = pd.DatetimeIndex(dates)
+    first = dates.year - (dates.month < 10)
+    return np.array([f'{y}/{(y + 1) % 100:02d}' for y in first])
+
+
+def frost_episodes(dates, depths, thresholds, profile=None):
+    """
+    Finds the contiguous episodes where the frost depth exceeds each of the
+    thresholds. Returns one row per episode with its start and end date,
+    duration, maximum frost depth, maximum exceedance and the exceedance
+    integrated over the episode (m days).
+    """
+    dates = np.asarray(dates, dtype='datetime64[D]')
+    depths = np.asarray(depths, dtype=np.float64)
+    thresholds = np.atleast_1d(np.asarray(thresholds, dtype=np.float64))
+
+    excess = depths[None, :] - thresholds[:, None]
+    exceeded = np.nan_to_num(excess, nan=-np.inf) > 0
+    rows, starts, ends = run_lengths(exceeded)
+
+    # Reduce every episode in one call on the flattened exceedance array
+    n = len(depths)
+    flat = np.append(np.where(exceeded, excess, 0).ravel(), 0)
+    bounds = np.empty(2 * len(starts), dtype=np.intp)
+    bounds[0::2] = rows * n + starts
+    bounds[1::2] = rows * n + ends
+    peak = np.maximum.reduceat(flat, bounds)[0::2] if len(starts) else flat[:0]
+    total = np.add.reduceat(flat, bounds)[0::2] if len(starts) else flat[:0]
+
+    episodes = pd.DataFrame({
+        'Threshold (m)': thresholds[rows],
+        'Season': frost_season(dates[starts]),
+        'Start': dates[starts],
+        'End': dates[ends - 1],
+        'Duration (days)': (dates[ends - 1] - dates[starts]).astype(int) + 1,
+        'Max frost depth (m)': thresholds[rows] + peak,
+        'Max exceedance (m)': peak,
+        'Exceedance (m days)': total,
+    })
+    if profile is not None:
+        episodes.insert(0, 'Profile', profile)
+    return episodes
+
+
+def episode_summary(episodes):
+    """
+    Summarises frost episodes per profile, threshold and frost season
+    """
+    keys = [k for k in ['Profile', 'Threshold (m)', 'Season']
+            if k in episodes.columns]
+    summary = episodes.groupby(keys).agg(
+        episodes=('Start', 'size'),
+        days=('Duration (days)', 'sum'),
+        longest=('Duration (days)', 'max'),
+        first=('Start', 'min'),
+        last=('End', 'max'),
+        depth=('Max frost depth (m)', 'max'),
+        exceedance=('Exceedance (m days)', 'sum'),
+    )
+    return summary.rename(columns={
+        'episodes': 'Episodes', 'days': 'Exceedance days',
+        'longest': 'Longest (days)', 'first': 'First start',
+        'last': 'Last end', 'depth': 'Max frost depth (m)',
+        'exceedance': 'Exceedance (m days)'}).reset_index()
@@ -0,0 +1,195 @@
+import os
+import re
+import requests
+import numpy as np
+import pandas as pd
+
+# The client id is read from FROST_CLIENT_ID; the API url can be set in the
+# environment too, e.g. to run against the local stand-in in mock_servers.py
+frost_url = os.environ.get('FROST_URL', 'https://frost.met.no')
+
+# Elements fetched by default for frost studies
+default_elements = [
+    'mean(air_temperature P1D)',
+    'sum(precipitation_amount P1D)',
+    'surface_snow_thickness',
+    'mean(soil_temperature P1D)',
+]
+
+
+def frost_auth():
+    """
+    Returns the basic auth tuple of the Frost client id set in the
+    environment
+    """
+    client_id = os.environ.get('FROST_CLIENT_ID')
+    if not client_id:
+        raise ValueError("FROST_CLIENT_ID is not set; register a client id at "
+                         "https://frost.met.no/auth/requestCredentials.html "
+                         "and export it as FROST_CLIENT_ID")
+    return (client_id, '')
+
+
+def find_source_id(municipality, session=None, base_url=frost_url):
+    """
+    Returns the id of the first Frost source found in the given municipality
+    """
+    session = session or requests.Session()
+    r = session.get(base_url + '/sources/v0.jsonld', auth=frost_auth())
+    r.raise_for_status()
+    return next((s['id'] for s in r.json()['data']
+                 if s.get('municipality') == municipality), None)
+
+
+def split_referencetime(referencetime, years_per_request=1):
+    """
+    Splits an inclusive 'YYYY-MM-DD/YYYY-MM-DD' period into consecutive
+    sub-periods so that each request stays below the Frost observation limit.
+    Frost treats the end of a period as exclusive, so the returned periods
+    end on the first day of the next one.
+    """
+    start, end = re.match(r'(\d{4}-\d{2}-\d{2})/(\d{4}-\d{2}-\d{2})',
+                          referencetime).groups()
+    start = pd.Timestamp(start)
+    end = pd.Timestamp(end) + pd.Timedelta(days=1)
+    periods = []
+    while start < end:
+        stop = min(start + pd.DateOffset(years=years_per_request), end)
+        periods.append(f'{start:%Y-%m-%d}/{stop:%Y-%m-%d}')
+        start = stop
+    return periods
+
+
+def fetch_observations(source_id, elements, referencetime, session=None,
+                       base_url=frost_url, **parameters):
+    """
+    Fetches all observations of several elements for one source and returns
+    them as a long table with one row per observation. Extra keyword
+    arguments (e.g. timeoffsets, levels) are passed on to Frost.
+    """
+    session = session or requests.Session()
+    endpoint = base_url + '/observations/v0.jsonld'
+    records = []
+    for period in split_referencetime(referencetime):
+        url = endpoint
+        params = dict(parameters, sources=source_id,
+                      elements=','.join(elements), referencetime=period)
+        while url:
+            r = session.get(url, params=params, auth=frost_auth())
+            if r.status_code == 404:
+                # Frost answers 404 when a period holds no data
+                break
+            r.raise_for_status()
+            json = r.json()
+            for item in json['data']:
+                for obs in item['observations']:
+                    records.append((item['referenceTime'], obs['elementId'],
+                                    obs.get('level'), obs['value'],
+                                    obs.get('qualityCode', -1),
+                                    obs.get('timeResolution')))
+            # Follow paging links if the response was split up
+            url, params = json.get('nextLink'), None
+
+    df = pd.DataFrame(records, columns=['time', 'element', 'level', 'value',
+                                        'qualityCode', 'resolution'])
+    df['element'] = [column_name(e, l) for e, l in zip(df['element'],
+                                                        df['level'])]
+    return df.drop(columns='level')
+
+
+def column_name(element, level=None):
+    """
+    Returns the table column name of an element, including the sensor level
+    for elements measured at several depths or heights
+    """
+    if not level:
+        return element
+    return f"{element}@{level['value']}{level.get('unit', '')}"
+
+
+def to_wide_table(observations):
+    """
+    Aligns a long observation table on a shared time index and returns a wide
+    table with a float32 value column and an int8 quality code column
+    ('<element>_qc', -1 where missing) per element. Daily elements are
+    aligned on their calendar date, since Frost reports them at different
+    times of day (e.g. precipitation at 06:00, temperature at 00:00).
+    """
+    obs = observations.assign(time=pd.to_datetime(observations['time'],
+                                                  utc=True))
+    resolution = obs['resolution'] if 'resolution' in obs else None
+    daily = obs['element'].str.contains('P1D', regex=False)
+    if resolution is not None:
+        daily |= resolution.eq('P1D')
+    obs.loc[daily, 'time'] = obs.loc[daily, 'time'].dt.floor('D')
+    # Keep one value per time and element if Frost returned duplicates
+    obs = obs.drop_duplicates(subset=['time', 'element'], keep='last')
+    values = obs.pivot(index='time', columns='element', values='value')
+    codes = obs.pivot(index='time', columns='element', values='qualityCode')
+
+    table = pd.DataFrame(index=values.index.sort_values())
+    for element in values.columns:
+        table[element] = values[element].astype(np.float32)
+        table[element + '_qc'] = (codes[element].fillna(-1)
+                                  .astype(np.int8))
+    table.index.name = 'time'
+    return table
+
+
+def save_table(table, path):
+    """
+    Saves a wide observation table as an uncompressed .npz file with one
+    array per column, so that readers can load single columns
+    """
+    arrays = {'time': table.index.tz_convert(None).values
+              .astype('datetime64[s]')}
+    for column in table.columns:
+        arrays[column] = table[column].values
+    np.savez(path, **arrays)
+
+
+def load_table(path, columns=None):
+    """
+    Loads a wide observation table saved with save_table. Only the requested
+    columns are read from disk.
+    """
+    with np.load(path) as npz:
+        names = [n for n in npz.files if n != 'time']
+        if columns is not None:
+            missing = set(columns) - set(names)
+            if missing:
+                raise KeyError(f'Columns not in {path}: {sorted(missing)}')
+            names = list(columns)
+        index = pd.DatetimeIndex(npz['time'], name='time').tz_localize('UTC')
+        return pd.DataFrame({n: npz[n] for n in names}, index=index)
+
+
+def table_columns(path):
+    """
+    Returns the column names stored in a table file without loading data
+    """
+    with np.load(path) as npz:
+        return [n for n in npz.files if n != 'time']
+
+
+if __name__ == "__main__":
+    municipality = 'ØYGARDEN'
+    referencetime = '2015-01-01/2024-12-31'
+
+    session = requests.Session()
+    source_id = find_source_id(municipality, session)
+    if source_id is None:
+        print(f"No weather station found in {municipality}")
+        exit(1)
+    print(f"Found source ID: {source_id}")
+
+    observations = fetch_observations(source_id, default_elements,
+                                      referencetime, session,
+                                      timeoffsets='default')
+    table = to_wide_table(observations)
+    print(table.describe())
+
+    start_date, end_date = referencetime.split('/')
+    filename = f'{municipality.capitalize()}_observations_{start_date}_to_{end_date}.npz'
+    save_table(table, filename)
+    print(f"Data saved to {os.path.abspath(filename)}")
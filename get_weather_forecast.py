@@ -3,29 +3,50 @@ import csv
 import requests
 import pandas as pd
 from matplotlib import rcParams
+import matplotlib.pyplot as plt
+from datetime import datetime, timedelta, timezone as tz
 import xml.etree.ElementTree as et
+from forecast_archive import ForecastArchive, archive_path
+from forecast_statistics import ForecastStatistics
 
 class WeatherData:
-  def __init__(self, url, xml_filename, csv_filename):
+  def __init__(self, url, xml_filename, csv_filename, data_dir=None):
     '''
-    Initializes object with url and necessary filenames
+    Initializes object with url and necessary filenames. Files are kept in
+    data_dir, by default the directory of this script.
     '''
     self.url = url
     self.xml_filename = xml_filename
     self.csv_filename = csv_filename
+    self.my_dir = data_dir or os.path.dirname(os.path.abspath(__file__))
+    self.session = requests.Session()
+    self.archive = ForecastArchive(archive_path(self.my_dir, xml_filename))
+    self.update_time = None
+    self.next_update = None
+    self.statistics = self.loadStatistics()
+
+  def loadStatistics(self):
+    '''
+    Loads the incremental statistics of the forecast history, building them
+    from the cleaned csv file the first time
+    '''
+    stem = self.csv_filename[:-4]
+    stats_file = os.path.join(self.my_dir, stem + '_Stats.npz')
+    clean_file = os.path.join(self.my_dir, stem + '_Clean.csv')
+    csv_file = os.path.join(self.my_dir, self.csv_filename)
+    if not os.path.exists(stats_file) and os.path.exists(clean_file):
+      return ForecastStatistics.from_clean_csv(clean_file, stats_file, csv_file)
+    return ForecastStatistics(stats_file)
 
   def requestDataFromYr(self):
     """
     Requests and saves weather forecast data from yr.no
     """
-    global my_dir
-    path = os.path.abspath(__file__)
-    my_dir = os.path.dirname(path)
-
     # Grab latest forecast from yr.no and save xml file
-    weather_data = requests.get(self.url, allow_redirects=True)
-    file = open(os.path.join(my_dir, self.xml_filename), 'wb')
-    file.write(weather_data.content)
+    weather_data = self.session.get(self.url, allow_redirects=True)
+    weather_data.raise_for_status()
+    with open(os.path.join(self.my_dir, self.xml_filename), 'wb') as file:
+      file.write(weather_data.content)
 
   def parseXMLFileAndWriteToCSV(self):
     '''
@@ -34,25 +55,14 @@ class WeatherData:
     data to a csv file
     '''
     # Read root XML data
-    tree = et.parse(os.path.join(my_dir, self.xml_filename))
+    tree = et.parse(os.path.join(self.my_dir, self.xml_filename))
     root = tree.getroot()
 
     # Get forecast child
     forecast = root.find('forecast').find('tabular')
 
-    # Check if the csv file exists - If not, create one in writing mode
-    # If yes, initiate the csv writer in appending mode
-    if not os.path.exists(os.path.join(my_dir, self.csv_filename)):
-      f = open(os.path.join(my_dir, self.csv_filename), 'w', newline='')
-      csvwriter = csv.writer(f)
-      col_names = ['From', 'To', 'Min Precip. (mm)', 'Avg Precip. (mm)',
-                   'Max Precip. (mm)', 'Temp. (C)']
-      csvwriter.writerow(col_names)
-    else:
-      f = open(os.path.join(my_dir, self.csv_filename), 'a', newline='')
-      csvwriter = csv.writer(f)
-
     # Extract data from the forecast child
+    rows = []
     for element in forecast.findall('time'):
       data = []
       start_time = element.get('from')
@@ -71,49 +81,79 @@ class WeatherData:
       data.append(avg_prcp)
       data.append(max_prcp)
       data.append(temp)
-      # Write a new row to csv file
-      csvwriter.writerow(data)
+      rows.append(data)
 
-    f.close()
+    self.writeRowsToCSV(rows)
 
     # Get forecast update time
-    global update_time
-    update_time = root.find('meta').find('lastupdate').text
-    update_time = update_time.replace(':','.')
-    upd_xml_filename = self.xml_filename[:-4] + '_' + update_time + '.xml'
-
-    # Rename forecast xml file with update time, pass if forecast not updated
-    try:
-      os.rename(os.path.join(my_dir, self.xml_filename),
-                os.path.join(my_dir, upd_xml_filename))
-    except FileExistsError:
-      pass
+    meta = root.find('meta')
+    self.update_time = meta.find('lastupdate').text.replace(':','.')
+
+    # Time of the next forecast update in UTC, the feed gives local time
+    timezone = root.find('location').find('timezone')
+    offset = timedelta(minutes=int(timezone.get('utcoffsetMinutes', 0)))
+    next_update = meta.find('nextupdate')
+    if next_update is not None:
+      next_update = datetime.fromisoformat(next_update.text) - offset
+      self.next_update = next_update.replace(tzinfo=tz.utc)
+
+    # Move the forecast xml file into the archive of snapshots, identical
+    # re-downloads are only stored once
+    with open(os.path.join(self.my_dir, self.xml_filename), 'rb') as f:
+      self.archive.append(f.read(), self.update_time)
+    os.remove(os.path.join(self.my_dir, self.xml_filename))
+
+  def writeRowsToCSV(self, rows):
+    '''
+    Appends forecast rows (From, To, min/avg/max precipitation and
+    temperature) to the csv file, creating it with a header if needed
+    '''
+    # Check if the csv file exists - If not, create one in writing mode
+    # If yes, initiate the csv writer in appending mode
+    if not os.path.exists(os.path.join(self.my_dir, self.csv_filename)):
+      f = open(os.path.join(self.my_dir, self.csv_filename), 'w', newline='')
+      csvwriter = csv.writer(f)
+      col_names = ['From', 'To', 'Min Precip. (mm)', 'Avg Precip. (mm)',
+                   'Max Precip. (mm)', 'Temp. (C)']
+      csvwriter.writerow(col_names)
+    else:
+      f = open(os.path.join(self.my_dir, self.csv_filename), 'a', newline='')
+      csvwriter = csv.writer(f)
+
+    # Write the new rows to csv file
+    csvwriter.writerows(rows)
+    f.close()
+
+    # Update the statistics with the new forecast issue
+    self.statistics.update(rows)
+    self.statistics.save()
 
   def updateForecasts(self):
     '''
     Drops old yr forecast data and keeps the updated ones
     '''
     # Load csv file with duplicate data
-    raw_data = pd.read_csv(os.path.join(my_dir, self.csv_filename))
+    raw_data = pd.read_csv(os.path.join(self.my_dir, self.csv_filename))
     # Clean data by keeping only latest forecasts
     clean_data = raw_data.drop_duplicates(subset=['From', 'To'], keep='last')
     # Write clean data to new csv file
     clean_file = self.csv_filename[:-4] + '_Clean.csv'
-    clean_data.to_csv(os.path.join(my_dir, clean_file), index=False)
+    clean_data.to_csv(os.path.join(self.my_dir, clean_file), index=False)
 
   def plotWeatherData(self):
     '''
     Plots a histogram from the accumulated precipitation data, the precipitation
     versus time and the temperature vs time for the latest forecast
     '''
-    # Load csv data for plotting
-    data_file = self.csv_filename[:-4] + '_Clean.csv'
-    data = pd.read_csv(os.path.join(my_dir, data_file))
+    # The histogram and the latest forecast come from the incremental
+    # statistics, so plotting does not reload the whole history
+    latest = self.statistics.latest(48)
+    accumulators = self.statistics.accumulators()
 
     # Separate precipitation and temperature data
-    prcp = data[['From', 'Min Precip. (mm)', 'Avg Precip. (mm)',
-                 'Max Precip. (mm)']]
-    temp = data[['From', 'Temp. (C)']]
+    prcp = latest[['From', 'Min Precip. (mm)', 'Avg Precip. (mm)',
+                   'Max Precip. (mm)']]
+    temp = latest[['From', 'Temp. (C)']]
 
     # Set chart parameters
     rcParams.update({'figure.autolayout': True})
@@ -121,33 +161,47 @@ class WeatherData:
     rcParams.update({'font.size': 11})
 
     # Plot histogram from precipitation data
-    ax0 = prcp.plot.hist(bins=20)   # bins=10 by default
+    _, ax0 = plt.subplots()
+    for column in prcp.columns[1:]:
+      acc = accumulators[column]
+      ax0.stairs(acc.histogram, acc.edges, fill=True, alpha=0.5)
     ax0.legend(['Minimum', 'Average', 'Maximum'])
     ax0.set_xlabel('Hourly Precipitation [mm]')
+    ax0.set_ylabel('Frequency')
 
     # Plot precipitation data for the latest 48 hour forecast
-    prcp_latest = prcp.tail(48)
-    ax1 = prcp_latest.plot.bar(x='From', figsize=(15,5))
+    ax1 = prcp.plot.bar(x='From', figsize=(15,5))
     ax1.legend(['Minimum', 'Average', 'Maximum'])
     ax1.set_ylabel('Precipitation [mm]')
     ax1.axes.get_xaxis().get_label().set_visible(False)
 
     # Plot temperature data for the latest 48 hour forecast
-    temp_latest = temp.tail(48)
-    ax2 = temp_latest.plot.bar(x='From', figsize=(15,5))
+    ax2 = temp.plot.bar(x='From', figsize=(15,5))
     ax2.get_legend().remove()
     ax2.set_ylabel('Temperature [C]')
     ax2.axes.get_xaxis().get_label().set_visible(False)
 
     # Plot names
-    fig1 = 'Histogram_' + update_time + '.png'
-    fig2 = 'Latest_Prcp_Forecast_' + update_time + '.png'
-    fig3 = 'Latest_Temp_Forecast_' + update_time + '.png'
-
-    # Save updated plots
-    ax0.get_figure().savefig(os.path.join(my_dir, fig1))
-    ax1.get_figure().savefig(os.path.join(my_dir, fig2))
-    ax2.get_figure().savefig(os.path.join(my_dir, fig3))
+    fig1 = 'Histogram_' + self.update_time + '.png'
+    fig2 = 'Latest_Prcp_Forecast_' + self.update_time + '.png'
+    fig3 = 'Latest_Temp_Forecast_' + self.update_time + '.png'
+
+    # Save updated plots and release them
+    for ax, fig in [(ax0, fig1), (ax1, fig2), (ax2, fig3)]:
+      ax.get_figure().savefig(os.path.join(self.my_dir, fig))
+      plt.close(ax.get_figure())
+
+  def update(self, plot=True):
+    '''
+    Runs a full update: download, parse, clean and optionally plot.
+    Returns the time of the next forecast update announced by the feed.
+    '''
+    self.requestDataFromYr()
+    self.parseXMLFileAndWriteToCSV()
+    self.updateForecasts()
+    if plot:
+      self.plotWeatherData()
+    return self.next_update
 
 if __name__ == "__main__":
   url = 'https://www.yr.no/place/Norway/Tr%C3%B8ndelag/Stj%C3%B8rdal/Flornes/forecast_hour_by_hour.xml'
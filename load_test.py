@@ -0,0 +1,176 @@
+import os
+import sys
+import time
+import tempfile
+import numpy as np
+import pandas as pd
+import requests
+from concurrent.futures import ThreadPoolExecutor
+
+import matplotlib
+matplotlib.use('Agg')
+
+from mock_servers import MockServer
+from get_weather_forecast import WeatherData
+from locationforecast import LocationForecastData
+from frost_observations import (default_elements, fetch_observations,
+                                to_wide_table, save_table)
+
+results_file = 'load_test_results.csv'
+# Drop in requests/s against the previous run that is reported as a regression
+regression_tolerance = 0.2
+
+
+def timed(job):
+    """
+    Runs job() and returns its wall time, thread CPU time and error
+    """
+    start, cpu = time.perf_counter(), time.thread_time()
+    error = None
+    try:
+        job()
+    except Exception as e:
+        error = f'{type(e).__name__}: {e}'
+    return time.perf_counter() - start, time.thread_time() - cpu, error
+
+
+def drive(name, jobs, rounds, workers, mock):
+    """
+    Runs every job once per round in a thread pool and summarises
+    throughput, latency and CPU per job (location)
+    """
+    before = mock.stats()['requests'].sum() if mock.counts else 0
+    timings = []
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for _ in range(rounds):
+            timings += pool.map(timed, jobs)
+    elapsed = time.perf_counter() - start
+    served = mock.stats()['requests'].sum() - before
+
+    wall = np.array([t[0] for t in timings])
+    cpu = np.array([t[1] for t in timings])
+    errors = [t[2] for t in timings if t[2] is not None]
+    return {
+        'pipeline': name,
+        'locations': len(jobs),
+        'updates': len(timings),
+        'failures': len(errors),
+        'requests': served,
+        'requests/s': served / elapsed,
+        'updates/s': len(timings) / elapsed,
+        'p50 (ms)': 1000 * np.percentile(wall, 50),
+        'p99 (ms)': 1000 * np.percentile(wall, 99),
+        'CPU per location (ms)': 1000 * cpu.mean(),
+    }
+
+
+def forecast_jobs(mock, n_locations, data_dir):
+    """
+    Returns one update job per location of the yr.no xml pipeline
+    """
+    jobs = []
+    for i in range(n_locations):
+        weather = WeatherData(
+            f'{mock.url}/place/Norway/Mock/Location{i}/forecast_hour_by_hour.xml',
+            f'Location{i}_Hourly_Forecast.xml', f'Location{i}_Hourly_Data.csv',
+            data_dir)
+        jobs.append(lambda w=weather: w.update(plot=False))
+    return jobs
+
+
+def locationforecast_jobs(mock, n_locations, data_dir):
+    """
+    Returns one update job per point of the locationforecast pipeline. The
+    expiry is reset before every update, so repeated rounds exercise the
+    conditional (304) requests.
+    """
+    jobs = []
+    for i in range(n_locations):
+        point = LocationForecastData(
+            60 + i / 100, 5 + i / 100, f'Point{i}_Forecast.json',
+            f'Point{i}_Hourly_Data.csv', data_dir,
+            url=f'{mock.url}/weatherapi/locationforecast/2.0/compact')
+
+        def job(p=point):
+            p.expires = None
+            p.update(plot=False)
+        jobs.append(job)
+    return jobs
+
+
+def frost_jobs(mock, n_sources, data_dir, referencetime='2015-01-01/2019-12-31'):
+    """
+    Returns one fetch, align and store job per Frost source
+    """
+    jobs = []
+    for i in range(n_sources):
+        def job(source=f'SN{i:05d}'):
+            session = requests.Session()
+            observations = fetch_observations(source, default_elements,
+                                              referencetime, session,
+                                              base_url=mock.url)
+            save_table(to_wide_table(observations),
+                       os.path.join(data_dir, f'{source}.npz'))
+        jobs.append(job)
+    return jobs
+
+
+def run(n_locations=50, rounds=3, workers=8, latency=0.05, error_rate=0.0):
+    """
+    Starts a mock server and drives the forecast and Frost pipelines
+    against it. Returns one row of measurements per pipeline.
+    """
+    # The mock accepts any client id
+    os.environ.setdefault('FROST_CLIENT_ID', 'load-test')
+    mock = MockServer(latency=latency, jitter=latency, error_rate=error_rate,
+                      page_size=500, seed=0)
+    mock.start()
+    rows = []
+    try:
+        with tempfile.TemporaryDirectory() as data_dir:
+            rows.append(drive('yr xml', forecast_jobs(mock, n_locations, data_dir),
+                              rounds, workers, mock))
+            rows.append(drive('locationforecast',
+                              locationforecast_jobs(mock, n_locations, data_dir),
+                              rounds, workers, mock))
+            rows.append(drive('frost', frost_jobs(mock, max(n_locations // 10, 1),
+                                                  data_dir), 1, workers, mock))
+    finally:
+        mock.stop()
+    print("\nRequests served by the mock server:")
+    print(mock.stats().to_string(index=False))
+    return pd.DataFrame(rows)
+
+
+def compare(results, previous):
+    """
+    Prints the change in throughput against a previous run and returns the
+    pipelines that slowed down by more than regression_tolerance
+    """
+    merged = results.merge(previous, on='pipeline', suffixes=('', ' before'))
+    merged['change'] = merged['updates/s'] / merged['updates/s before'] - 1
+    print("\nChange in updates/s against the previous run:")
+    print(merged[['pipeline', 'updates/s before', 'updates/s', 'change']]
+          .round(3).to_string(index=False))
+    return list(merged.loc[merged['change'] < -regression_tolerance, 'pipeline'])
+
+
+if __name__ == "__main__":
+    n_locations = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else 8
+    latency = float(sys.argv[4]) if len(sys.argv) > 4 else 0.05
+    error_rate = float(sys.argv[5]) if len(sys.argv) > 5 else 0.0
+
+    results = run(n_locations, rounds, workers, latency, error_rate)
+    print("\nLoad test results:")
+    print(results.round(2).to_string(index=False))
+
+    regressions = []
+    if os.path.exists(results_file):
+        regressions = compare(results, pd.read_csv(results_file))
+    results.to_csv(results_file, index=False)
+    if regressions:
+        print(f"\nThroughput regression in: {', '.join(regressions)}")
+        sys.exit(1)
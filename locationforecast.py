@@ -0,0 +1,160 @@
+import os
+import json
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime, format_datetime
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import orjson
+    loads = orjson.loads
+except ImportError:
+    # Fallback if orjson is not available
+    loads = json.loads
+
+from get_weather_forecast import WeatherData
+
+api_url = 'https://api.met.no/weatherapi/locationforecast/2.0/compact'
+# MET requires an identifying User-Agent
+user_agent = 'weather_data_from_yr github.com/yaredwb/weather_data_from_yr'
+
+
+def forecast_rows(forecast):
+    """
+    Maps a locationforecast 2.0 document to the rows written by WeatherData
+    (From, To, min/avg/max precipitation, temperature). Only time steps with
+    a one hour precipitation forecast are used, like the hourly xml feed.
+    """
+    rows = []
+    for step in forecast['properties']['timeseries']:
+        next_hour = step['data'].get('next_1_hours')
+        if next_hour is None:
+            continue
+        start = datetime.fromisoformat(step['time'].replace('Z', '+00:00'))
+        end = start + timedelta(hours=1)
+        details = next_hour['details']
+        min_prcp = details.get('precipitation_amount_min')
+        max_prcp = details.get('precipitation_amount_max')
+        # Same convention as the xml feed when no range is given
+        if min_prcp is None or max_prcp is None:
+            min_prcp, max_prcp = 0, 0
+        rows.append([start.strftime('%Y-%m-%dT%H:%M:%SZ'),
+                     end.strftime('%Y-%m-%dT%H:%M:%SZ'),
+                     min_prcp, details.get('precipitation_amount'), max_prcp,
+                     step['data']['instant']['details']['air_temperature']])
+    return rows
+
+
+class LocationForecastData(WeatherData):
+    """
+    WeatherData backend for MET's locationforecast 2.0 JSON at a coordinate.
+    Requests honour Expires and Last-Modified, so a point is never fetched
+    again before MET publishes a new forecast for it.
+    """
+    def __init__(self, lat, lon, json_filename, csv_filename, data_dir=None,
+                 url=api_url):
+        # MET asks for at most four decimals in coordinates
+        url = f'{url}?lat={lat:.4f}&lon={lon:.4f}'
+        super().__init__(url, json_filename, csv_filename, data_dir)
+        self.session.headers['User-Agent'] = user_agent
+        self.state_file = os.path.join(
+            self.my_dir, os.path.splitext(json_filename)[0] + '.http.json')
+        self.expires = None
+        self.last_modified = None
+        if os.path.exists(self.state_file):
+            with open(self.state_file) as f:
+                state = json.load(f)
+            self.expires = parsedate_to_datetime(state['expires'])
+            self.last_modified = state['last_modified']
+        self.next_update = self.expires
+
+    def isExpired(self):
+        return (self.expires is None
+                or datetime.now(timezone.utc) >= self.expires)
+
+    def requestDataFromYr(self):
+        """
+        Requests the forecast if the previous one has expired and saves it.
+        Returns True if a new forecast was downloaded.
+        """
+        if not self.isExpired():
+            return False
+        headers = {}
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        response = self.session.get(self.url, headers=headers)
+        if response.status_code != 304:
+            response.raise_for_status()
+
+        # Remember when to ask again and what we already have
+        expires = response.headers.get('Expires')
+        self.expires = (parsedate_to_datetime(expires) if expires else
+                        datetime.now(timezone.utc) + timedelta(minutes=30))
+        self.last_modified = response.headers.get('Last-Modified',
+                                                  self.last_modified)
+        self.next_update = self.expires
+        with open(self.state_file, 'w') as f:
+            json.dump({'expires': format_datetime(self.expires, usegmt=True),
+                       'last_modified': self.last_modified}, f)
+
+        if response.status_code == 304:
+            return False
+        with open(os.path.join(self.my_dir, self.xml_filename), 'wb') as file:
+            file.write(response.content)
+        return True
+
+    def parseJSONAndWriteToCSV(self):
+        """
+        Parses the downloaded JSON forecast, appends its rows to the csv
+        file and moves the snapshot into the archive
+        """
+        path = os.path.join(self.my_dir, self.xml_filename)
+        with open(path, 'rb') as f:
+            content = f.read()
+        forecast = loads(content)
+        self.writeRowsToCSV(forecast_rows(forecast))
+
+        updated_at = forecast['properties']['meta']['updated_at']
+        self.update_time = updated_at.replace(':', '.')
+        self.archive.append(content, self.update_time)
+        os.remove(path)
+
+    def update(self, plot=True):
+        """
+        Runs a full update if a new forecast is available. Returns the time
+        the current forecast expires.
+        """
+        if self.requestDataFromYr():
+            self.parseJSONAndWriteToCSV()
+            self.updateForecasts()
+            if plot:
+                self.plotWeatherData()
+        return self.next_update
+
+
+def refresh_all(forecasts, workers=8):
+    """
+    Updates all expired points in parallel. forecasts maps names to
+    LocationForecastData objects; returns the names that got new data.
+    """
+    expired = [name for name, f in forecasts.items() if f.isExpired()]
+
+    def refresh(name):
+        before = forecasts[name].update_time
+        forecasts[name].update(plot=False)
+        return forecasts[name].update_time != before
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        updated = list(pool.map(refresh, expired))
+    return [name for name, new in zip(expired, updated) if new]
+
+
+if __name__ == "__main__":
+    # Coordinate based sites, e.g. the trench locations
+    points = {
+        'Oygarden': (60.5750, 4.8500),
+    }
+    forecasts = {name: LocationForecastData(lat, lon, f'{name}_Forecast.json',
+                                            f'{name}_Hourly_Data.csv')
+                 for name, (lat, lon) in points.items()}
+    updated = refresh_all(forecasts)
+    print(f"Updated {len(updated)} of {len(forecasts)} points: {', '.join(updated)}")
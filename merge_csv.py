@@ -1,4 +1,7 @@
+import os
 import pandas as pd
+from series_quality import (read_frost_daily, read_met_daily, complete_daily,
+                            find_gaps, fill_series, day_numbers)
 
 # Specify the exact files we want to merge
 files = [
@@ -14,28 +17,39 @@ files = [
     'Øygarden_temperature_2024-01-01_to_2025-01-31.csv'
 ]
 
-# Initialize an empty list to store dataframes
-dfs = []
+# Neighbouring station used to fill longer gaps
+neighbour_file = 'Flesland_middeltemperatur_døgn_fra_1995.csv'
 
-# Read each CSV file and append to list
+# Read the files that exist
+existing = []
 for file in files:
-    try:
-        df = pd.read_csv(file)
-        dfs.append(df)
-    except FileNotFoundError:
+    if os.path.exists(file):
+        existing.append(file)
+    else:
         print(f"Warning: File {file} not found")
 
-# Concatenate all dataframes
-merged_df = pd.concat(dfs, ignore_index=True)
-
-# Sort by date
-merged_df = merged_df.sort_values('date')
-
-# Remove any duplicates
-merged_df = merged_df.drop_duplicates()
-
-# Replace dates with sequential numbers starting from 1
-merged_df['date'] = range(1, len(merged_df) + 1)
+# Concatenate all series, sorted by date
+series = read_frost_daily(existing)
+
+# Put the series on a full daily calendar so missing days are not skipped
+frame = pd.DataFrame({'temperature': series,
+                      'neighbour': read_met_daily(neighbour_file)})
+frame = frame.loc[series.index.min():series.index.max()]
+
+# Report gaps, then fill short ones by interpolation and longer ones from
+# the neighbouring station
+gaps = find_gaps(complete_daily(frame[['temperature']]))
+print(f"Found {len(gaps)} gaps, {gaps['length'].sum()} missing days:")
+print(gaps.to_string(index=False))
+filled, flags = fill_series(frame, neighbours={'temperature': 'neighbour'})
+merged_df = filled[['temperature']].round(1)
+# The thermal model cannot read missing values
+if merged_df['temperature'].isna().any():
+    raise ValueError(f"{merged_df['temperature'].isna().sum()} days could not be filled, "
+                     "the merged file was not written")
+
+# Number the days from the first date, so that day numbers match the calendar
+merged_df.insert(0, 'date', day_numbers(merged_df.index, merged_df.index[0]))
 
 # Save to new CSV file with comma as decimal separator and semicolon as delimiter
 merged_df.to_csv('Øygarden_temperature_2015_2025.csv', 
@@ -0,0 +1,294 @@
+import sys
+import zlib
+import json
+import time
+import random
+import threading
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from urllib.parse import urlsplit, parse_qs, urlencode
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import numpy as np
+import pandas as pd
+
+from forecast_archive import ForecastArchive
+
+# Offset of the local time given in the synthetic xml feed (CET)
+utc_offset = timedelta(minutes=60)
+# Hours in one synthetic forecast
+forecast_hours = 48
+
+
+class MockServer:
+    """
+    Local stand-in for the yr.no xml feed, MET's locationforecast 2.0 and
+    the Frost API, all served from one port. Forecasts are synthetic (or
+    replayed from a ForecastArchive) and change every update_interval
+    seconds. Every request is delayed by latency plus a random jitter and
+    fails with a 503 with probability error_rate.
+    """
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0,
+                 page_size=1000, update_interval=3600, replay=None,
+                 client_id=None, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.page_size = page_size
+        self.update_interval = update_interval
+        self.replay = ForecastArchive(replay) if replay else None
+        self.client_id = client_id
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counts = {}
+        self.server = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def issue_time(self):
+        """
+        Returns the issue time of the current forecast (UTC)
+        """
+        now = time.time()
+        issued = now - now % self.update_interval
+        return datetime.fromtimestamp(issued, timezone.utc)
+
+    def count(self, api, status):
+        with self.lock:
+            key = (api, status)
+            self.counts[key] = self.counts.get(key, 0) + 1
+
+    def stats(self):
+        """
+        Returns the number of requests served per api and status code
+        """
+        with self.lock:
+            rows = [(api, status, n) for (api, status), n in self.counts.items()]
+        return pd.DataFrame(rows, columns=['api', 'status', 'requests']) \
+            .sort_values(['api', 'status'], ignore_index=True)
+
+    def weather(self, name, issued):
+        """
+        Returns synthetic hourly precipitation and temperature for a
+        location, repeatable for the same name and issue time
+        """
+        rng = np.random.default_rng([zlib.crc32(name.encode()),
+                                     int(issued.timestamp())])
+        hours = np.arange(forecast_hours)
+        start = issued.replace(minute=0, second=0) + timedelta(hours=1)
+        day = 2 * np.pi * (start.hour + hours - 15) / 24
+        temp = 5 + 4 * np.cos(day) + rng.normal(0, 1, len(hours)).cumsum() / 3
+        prcp = np.where(rng.random(len(hours)) < 0.3,
+                        rng.gamma(1.0, 1.2, len(hours)), 0.0)
+        return start, temp.round(1), prcp.round(1)
+
+    def forecast_xml(self, name):
+        """
+        Returns a forecast in the yr.no forecast_hour_by_hour.xml format
+        """
+        issued = self.issue_time()
+        if self.replay is not None and len(self.replay):
+            # Replay archived snapshots in turn, one per update interval
+            times = self.replay.update_times()
+            n = int(issued.timestamp() // self.update_interval) % len(times)
+            return self.replay.get(times[n])
+        start, temp, prcp = self.weather(name, issued)
+        local = lambda t: (t + utc_offset).strftime('%Y-%m-%dT%H:%M:%S')
+        rows = []
+        for i in range(forecast_hours):
+            t = start + timedelta(hours=i)
+            rows.append(
+                f'<time from="{local(t)}" to="{local(t + timedelta(hours=1))}">'
+                f'<precipitation value="{prcp[i]}" minvalue="{max(prcp[i] - 0.2, 0):.1f}" '
+                f'maxvalue="{prcp[i] + 0.4:.1f}" />'
+                f'<temperature unit="celsius" value="{temp[i]}" /></time>')
+        next_update = issued + timedelta(seconds=self.update_interval)
+        return (
+            '<?xml version="1.0" encoding="utf-8"?>\n<weatherdata>'
+            f'<location><name>{name}</name><type>Mock</type>'
+            f'<timezone id="Europe/Oslo" utcoffsetMinutes="{utc_offset.seconds // 60}" />'
+            '</location>'
+            f'<meta><lastupdate>{local(issued)}</lastupdate>'
+            f'<nextupdate>{local(next_update)}</nextupdate></meta>'
+            f'<forecast><tabular>{"".join(rows)}</tabular></forecast>'
+            '</weatherdata>').encode()
+
+    def forecast_json(self, lat, lon):
+        """
+        Returns a forecast in the locationforecast 2.0 compact format
+        """
+        issued = self.issue_time()
+        start, temp, prcp = self.weather(f'{lat},{lon}', issued)
+        steps = []
+        for i in range(forecast_hours):
+            t = start + timedelta(hours=i)
+            steps.append({
+                'time': t.strftime('%Y-%m-%dT%H:%M:%SZ'),
+                'data': {
+                    'instant': {'details': {'air_temperature': temp[i]}},
+                    'next_1_hours': {'details': {
+                        'precipitation_amount': prcp[i],
+                        'precipitation_amount_min': max(prcp[i] - 0.2, 0),
+                        'precipitation_amount_max': prcp[i] + 0.4}},
+                }})
+        return json.dumps({
+            'type': 'Feature',
+            'geometry': {'type': 'Point', 'coordinates': [lon, lat]},
+            'properties': {
+                'meta': {'updated_at': issued.strftime('%Y-%m-%dT%H:%M:%SZ')},
+                'timeseries': steps},
+        }).encode()
+
+    def observations(self, sources, elements, referencetime):
+        """
+        Returns synthetic daily Frost observation items for a period
+        """
+        start, end = referencetime.split('/')
+        days = pd.date_range(start, end, freq='D', inclusive='left', tz='UTC')
+        day = 2 * np.pi * (days.dayofyear.values - 200) / 365
+        items = []
+        for source in sources.split(','):
+            rng = np.random.default_rng(zlib.crc32(source.encode()))
+            temp = 8 + 6 * np.cos(day) + rng.normal(0, 2, len(days))
+            for i, t in enumerate(days):
+                # Like Frost's default time offsets, daily precipitation is
+                # reported at 06:00 and the other elements at 00:00
+                by_offset = {0: [], 6: []}
+                for element in elements.split(','):
+                    obs = {'elementId': element, 'qualityCode': 0,
+                           'timeResolution': 'P1D', 'timeOffset': 'PT0H'}
+                    offset = 0
+                    if 'precipitation' in element:
+                        obs['value'] = round(float(rng.gamma(0.8, 4)), 1)
+                        obs['timeOffset'] = 'PT6H'
+                        offset = 6
+                    elif 'snow' in element:
+                        obs['value'] = 0 if temp[i] > 0 else 5
+                        obs['timeOffset'] = 'PT6H'
+                        offset = 6
+                    elif 'soil' in element:
+                        obs['value'] = round(float(temp[i]) * 0.6 + 3, 1)
+                        obs['level'] = {'levelType': 'depth_below_surface',
+                                        'unit': 'm', 'value': 0.1}
+                    else:
+                        obs['value'] = round(float(temp[i]), 1)
+                    by_offset[offset].append(obs)
+                for offset, observations in by_offset.items():
+                    if not observations:
+                        continue
+                    reference = t + pd.Timedelta(hours=offset)
+                    items.append({'sourceId': f'{source}:0',
+                                  'referenceTime': reference.strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+                                  'observations': observations})
+        return items
+
+    def handle(self, request):
+        """
+        Answers one GET request, returns status, headers and body
+        """
+        url = urlsplit(request.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        if url.path.endswith('.xml'):
+            api = 'yr'
+        elif url.path.startswith('/weatherapi/locationforecast'):
+            api = 'locationforecast'
+        elif url.path.endswith('.jsonld'):
+            api = 'frost'
+        else:
+            return 'other', 404, {}, b'not found'
+
+        time.sleep(self.latency + self.random.uniform(0, self.jitter))
+        if self.random.random() < self.error_rate:
+            return api, 503, {}, b'service unavailable'
+
+        if api == 'yr':
+            name = url.path.strip('/').split('/')[-2]
+            return api, 200, {'Content-Type': 'text/xml'}, self.forecast_xml(name)
+
+        if api == 'locationforecast':
+            issued = self.issue_time()
+            headers = {
+                'Content-Type': 'application/json',
+                'Last-Modified': format_datetime(issued, usegmt=True),
+                'Expires': format_datetime(
+                    issued + timedelta(seconds=self.update_interval), usegmt=True),
+            }
+            since = request.headers.get('If-Modified-Since')
+            if since and parsedate_to_datetime(since) >= issued:
+                return api, 304, headers, b''
+            return api, 200, headers, self.forecast_json(
+                float(query['lat']), float(query['lon']))
+
+        if self.client_id and not request.headers.get('Authorization'):
+            return api, 401, {}, b'{"error": {"message": "no client id"}}'
+        if url.path.startswith('/sources'):
+            body = {'data': [{'id': 'SN00001', 'name': 'MOCK STATION',
+                              'municipality': 'ØYGARDEN'}]}
+            return api, 200, {'Content-Type': 'application/json'}, \
+                json.dumps(body).encode()
+
+        items = self.observations(query['sources'], query['elements'],
+                                  query['referencetime'])
+        if not items:
+            return api, 404, {}, b'{"error": {"message": "no data"}}'
+        # Split long answers into pages linked by nextLink, like Frost
+        offset = int(query.get('offset', 0))
+        body = {'data': items[offset:offset + self.page_size]}
+        if offset + self.page_size < len(items):
+            query['offset'] = offset + self.page_size
+            body['nextLink'] = f'{self.url}{url.path}?{urlencode(query)}'
+        return api, 200, {'Content-Type': 'application/json'}, \
+            json.dumps(body).encode()
+
+    def start(self, port=0, host='127.0.0.1'):
+        """
+        Serves requests on a background thread, port 0 picks a free port
+        """
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                api, status, headers, body = mock.handle(self)
+                mock.count(api, status)
+                self.send_response(status)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self.url
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8080
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.05
+    error_rate = float(sys.argv[3]) if len(sys.argv) > 3 else 0.0
+
+    mock = MockServer(latency=latency, jitter=latency, error_rate=error_rate)
+    url = mock.start(port)
+    print(f"Serving mock yr.no, locationforecast and Frost on {url}")
+    print(f"  {url}/place/Norway/Vestland/Oygarden/forecast_hour_by_hour.xml")
+    print(f"  {url}/weatherapi/locationforecast/2.0/compact?lat=60.5&lon=4.85")
+    print(f"  FROST_CLIENT_ID=test FROST_URL={url} python frost_observations.py")
+    try:
+        while True:
+            time.sleep(60)
+            print(mock.stats().to_string(index=False))
+    except KeyboardInterrupt:
+        mock.stop()
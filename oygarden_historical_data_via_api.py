@@ -2,12 +2,11 @@ import requests
 import pandas as pd
 from datetime import datetime, timedelta
 import re
-
-client_id = 'b81ff387-2723-48d0-877c-1a26edf1001c'
+from frost_observations import frost_auth, frost_url
 
 # First find the source ID for Øygarden
-sources_endpoint = 'https://frost.met.no/sources/v0.jsonld'
-r = requests.get(sources_endpoint, auth=(client_id, ''))
+sources_endpoint = frost_url + '/sources/v0.jsonld'
+r = requests.get(sources_endpoint, auth=frost_auth())
 if r.status_code == 200:
     sources = r.json()['data']
     source_id = next((s['id'] for s in sources 
@@ -22,7 +21,7 @@ else:
     exit(1)
 
 # Define endpoint and parameters
-endpoint = 'https://frost.met.no/observations/v0.jsonld'
+endpoint = frost_url + '/observations/v0.jsonld'
 parameters = {
     'sources': source_id,
     'elements': 'air_temperature',  
@@ -33,7 +32,7 @@ parameters = {
 start_date, end_date = re.match(r'(\d{4}-\d{2}-\d{2})/(\d{4}-\d{2}-\d{2})', parameters['referencetime']).groups()
 
 # Get the weather data
-r = requests.get(endpoint, parameters, auth=(client_id, ''))
+r = requests.get(endpoint, parameters, auth=frost_auth())
 json = r.json()
 
 # Check if the request worked
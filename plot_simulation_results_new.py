@@ -1,7 +1,10 @@
 import pandas as pd
-import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
+from simulation_field import open_field, read_profile_csv
+from frost_exceedance import frost_depths, frost_episodes, episode_summary
+from cross_section_field import open_cross_section
+from find_coordinates_trench import dimensions
 
 # Simulation results files
 simulation_results_files = [
@@ -10,71 +13,52 @@ simulation_results_files = [
     'temperature_vs_depth_results_profile_x=4.4_oygard_model_concrete_channel_1995-2025.csv',
 ]
 
-# Read the simulation results
-dataframes = []
-for file in simulation_results_files:
-    df = pd.read_csv(file, sep=';', encoding='latin1', skiprows=2, header=None, decimal=',')
-    # Set column names, first column depth, second column T(°C) Day 1, third column T(°C) Day 2, etc.
-    # Assuming the first column is depth and the rest are temperature values
-    df.columns = ['Depth (m)'] + [f'Temperature Day {i+1}' for i in range(df.shape[1]-1)]    
-    dataframes.append(df)
-
-
-# Determine the frost penetration depth for each simulation result, for each day
-frost_penetration_depths = []
-for df in dataframes:
-    frost_depths = []
-    for col in df.columns[1:]:
-        temperatures = df[col].values
-        depths = df['Depth (m)'].values
-        
-        # Check if there's any frost at all
-        if np.min(temperatures) >= 0:
-            # No frost
-            frost_depth = np.nan
-        elif np.max(temperatures) < 0:
-            # Everything is frozen
-            frost_depth = max(depths)
-        else:
-            # Find the deepest point where temperature is <= 0°C
-            frozen_indices = np.where(temperatures <= 0)[0]
-            if len(frozen_indices) > 0:
-                max_frozen_index = frozen_indices[-1]
-                
-                # If this is the last point, use it as frost depth
-                if max_frozen_index == len(temperatures) - 1:
-                    frost_depth = depths[max_frozen_index]
-                else:
-                    # Interpolate between the last frozen point and the first non-frozen point
-                    t1 = temperatures[max_frozen_index]
-                    t2 = temperatures[max_frozen_index + 1]
-                    d1 = depths[max_frozen_index]
-                    d2 = depths[max_frozen_index + 1]
-                    
-                    # Linear interpolation
-                    frost_depth = d1 + (0 - t1) * (d2 - d1) / (t2 - t1)
-            else:
-                frost_depth = np.nan
-                
-        frost_depths.append(frost_depth)
-    frost_penetration_depths.append(frost_depths)
-
-# Location of top of water pipe (defined early for the frost depth check)
+# Full cross-section export; if set, profiles are extracted from it at the
+# x positions below instead of reading one export per profile
+cross_section_file = None
+profile_positions = [5.0, 4.8, 4.4]
+
+if cross_section_file is not None:
+    # Frost fronts of all profiles in one pass over the cross-section
+    cross_section = open_cross_section(cross_section_file)
+    dates, fronts = cross_section.frost_fronts(profile_positions)
+    profile_dates = [dates] * len(profile_positions)
+    frost_penetration_depths = list(fronts.T)
+else:
+    # Open the simulation results, converted to binary form on first use
+    fields = [open_field(file, read_profile_csv) for file in simulation_results_files]
+    profile_dates = [field.dates for field in fields]
+
+    # Determine the frost penetration depth for each simulation result, for each day
+    frost_penetration_depths = [frost_depths(field.values, field.depths) for field in fields]
+
+# Location of top of water pipe
 depth_water_pipe = 0.47  # in meters
 
-# Find days when frost depth exceeds water pipe depth
-print("\nDays when frost depth exceeds water pipe depth ({}m):".format(depth_water_pipe))
-for i, frost_depths in enumerate(frost_penetration_depths):
-    critical_days = []
-    for day, depth in enumerate(frost_depths, start=1):
-        if depth is not None and depth > depth_water_pipe:
-            critical_days.append(day)
-    
-    profile_name = f"Profile {i+1}"
-    if critical_days:
-        print(f"{profile_name}: Days {', '.join(map(str, critical_days))} (total: {len(critical_days)} days)")
-    else:
-        print(f"{profile_name}: No days with frost depth exceeding water pipe depth")
+# Design depths checked for exceedance: top and centre of the water pipe
+frost_thresholds = {'pipe top': depth_water_pipe,
+                    'pipe centre': depth_water_pipe + dimensions['Pipe_diameter'] / 2}
+
+# Find frost episodes deeper than the thresholds, per profile and winter
+episodes = pd.concat([frost_episodes(dates, depths, list(frost_thresholds.values()), profile=f"Profile {i+1}")
+                      for i, (dates, depths) in enumerate(zip(profile_dates, frost_penetration_depths))],
+                     ignore_index=True)
+summary = episode_summary(episodes)
+
+for name, threshold in frost_thresholds.items():
+    print(f"\nFrost episodes exceeding the {name} ({threshold:.3f}m):")
+    for i in range(len(frost_penetration_depths)):
+        profile_name = f"Profile {i+1}"
+        profile_summary = summary[(summary['Profile'] == profile_name)
+                                  & (summary['Threshold (m)'] == threshold)]
+        if len(profile_summary):
+            print(f"{profile_name}: {profile_summary['Episodes'].sum()} episodes, "
+                  f"{profile_summary['Exceedance days'].sum()} days")
+            print(profile_summary.drop(columns=['Profile', 'Threshold (m)']).to_string(index=False))
+        else:
+            print(f"{profile_name}: No days with frost depth exceeding the {name}")
+
+episodes.to_csv('frost_episodes.csv', index=False)
 
 plt.style.use('default')  # Start with default style
 sns.set_theme(style="ticks")  # Modern seaborn style
@@ -87,11 +71,10 @@ plt.rcParams['grid.linestyle'] = '--'
 plt.rcParams['grid.alpha'] = 0.7
 plt.rcParams['grid.color'] = '#cccccc'
 
-# Location of top of water pipe
-depth_water_pipe = 0.47  # in meters
-
 # Create figure with subplots - make it longer horizontally
-fig, axes = plt.subplots(3, 1, figsize=(12, 9), sharex=True)
+n_profiles = len(frost_penetration_depths)
+fig, axes = plt.subplots(n_profiles, 1, figsize=(12, 3 * n_profiles), sharex=True, squeeze=False)
+axes = axes[:, 0]
 fig.tight_layout(pad=3.0)
 
 # Norwegian text for labels
@@ -101,18 +84,18 @@ water_pipe_label = 'Vannrør'
 profile_label = 'Profil'
 
 # Plot each profile in its own subplot
-for i, frost_depths in enumerate(frost_penetration_depths):
+for i, profile_depths in enumerate(frost_penetration_depths):
     ax = axes[i]
     
     # Plot frost depth
-    ax.plot(range(len(frost_depths)), frost_depths, color='blue', linewidth=2)
+    ax.plot(range(len(profile_depths)), profile_depths, color='blue', linewidth=2)
     
     # Add water pipe depth as horizontal dashed line
     ax.axhline(y=depth_water_pipe, color='red', linestyle='--', linewidth=1.5, 
                label=water_pipe_label)
     
     # Add labels and legend
-    if i == 2:  # Only add x-label to bottom plot
+    if i == n_profiles - 1:  # Only add x-label to bottom plot
         ax.set_xlabel(x_label, fontsize=12)
     ax.set_ylabel(y_label, fontsize=12)
     ax.set_title(f'{profile_label} {i+1}', fontsize=14)
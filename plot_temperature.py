@@ -5,6 +5,9 @@ import numpy as np
 from datetime import datetime, timedelta
 from matplotlib.dates import YearLocator, MonthLocator, DateFormatter
 from scipy import signal
+import os
+from seasonal_cube import SeasonalCube, cached_cube
+from series_quality import complete_daily
 
 # Set style for publication-ready plot
 # Use a valid style from matplotlib
@@ -19,95 +22,154 @@ plt.rcParams['grid.linestyle'] = '--'
 plt.rcParams['grid.alpha'] = 0.7
 plt.rcParams['grid.color'] = '#cccccc'
 
-# Read the data and convert semicolon separator and comma decimal
-# df = pd.read_csv('Øygarden_temperature_2015_2025.csv', sep=';', decimal=',')
-df = pd.read_csv('flesland_daily_average_temperature_from_1995.csv', sep=';', decimal=',')
+# Observation table from frost_observations.py, read instead of the csv if set
+observations_file = None
+temperature_element = 'mean(air_temperature P1D)'
 
-# Create date range starting from January 1, 2015
-start_date = datetime(1995, 1, 1)
-df['date'] = [start_date + timedelta(days=i-1) for i in df['date']]
+# Length of the moving average window for the trend (days)
+window_size = 365
 
-# Extract month and year for seasonal analysis
-df['month'] = df['date'].dt.month
-df['year'] = df['date'].dt.year
 
-# Calculate moving average (365-day window) for trend
-window_size = 365
-df['trend'] = df['temperature'].rolling(window=window_size, center=True).mean()
-
-# Apply Savitzky-Golay filter for smoother trend visualization
-try:
-    from scipy.signal import savgol_filter
-    df['smooth_trend'] = savgol_filter(df['temperature'], 
-                                       window_length=window_size, 
-                                       polyorder=3)
-except:
-    # Fallback if savgol_filter is not available
-    df['smooth_trend'] = df['trend']
-
-# Create figure and axes with better proportions
-fig, ax = plt.subplots(figsize=(12, 7))
-
-# Plot temperature data with enhanced aesthetics
-ax.plot(df['date'], df['temperature'], 
-        linewidth=0.8, 
-        color='#1f77b4', 
-        alpha=0.7,
-        label='Daglig temperatur')
-
-# Add trend line
-ax.plot(df['date'], df['smooth_trend'], 
-        linewidth=2.5, 
-        color='#d62728', 
-        alpha=0.8,
-        label='Temperaturtrend')
-
-# Calculate and plot annual average temperatures
-yearly_avg = df.groupby('year')['temperature'].mean()
-years = [datetime(year, 1, 1) for year in yearly_avg.index]
-ax.plot(years, yearly_avg.values, 'o-', 
-        linewidth=2, 
-        color='#2ca02c',
-        markersize=6,
-        markerfacecolor='white',
-        markeredgewidth=2,
-        label='Årlig gjennomsnitt')
-
-# Format x-axis with cleaner date labels - show fewer years to avoid crowding
-years = YearLocator(base=5)  # Show every 5 years instead of every year
-months = MonthLocator(bymonth=[1])  # Only January
-year_fmt = DateFormatter('%Y')
-
-ax.xaxis.set_major_locator(years)
-ax.xaxis.set_major_formatter(year_fmt)
-ax.xaxis.set_minor_locator(months)
-
-# Customize the plot with Norwegian text
-ax.set_xlabel('År', fontsize=12, fontweight='bold', labelpad=10)
-ax.set_ylabel('Temperatur (°C)', fontsize=12, fontweight='bold', labelpad=10)
-ax.set_title('Temperaturvariasjon i Flesland (1995-2024)', 
-             fontsize=14, fontweight='bold', pad=20)
-
-# Format axis appearance
-ax.spines['top'].set_visible(False)
-ax.spines['right'].set_visible(False)
-plt.xticks(rotation=0)  # Horizontal year labels
-
-# Add some padding
-plt.margins(x=0.01)
-
-# Add legend with better positioning
-legend = ax.legend(loc='upper right', frameon=True, framealpha=0.9, fontsize=10)
-legend.get_frame().set_facecolor('white')
-legend.get_frame().set_edgecolor('lightgray')
-
-# Add descriptive text about data - updated source
-plt.figtext(0.02, 0.02, 'Datakilde: MET', 
-            fontsize=8, color='gray', ha='left')
-
-# Adjust layout
-plt.tight_layout()
-
-# Save the plot
-plt.savefig('temperatur_plot_flesland.png', dpi=300, bbox_inches='tight')
-plt.show()
\ No newline at end of file
+def read_daily_temperature(input_file, start_date=datetime(1995, 1, 1)):
+    """
+    Reads a daily temperature series, either a csv file with day numbers
+    counted from start_date (semicolon separator and comma decimal) or an
+    observation table from frost_observations.py. Returns a DataFrame with
+    date and temperature columns, without missing values and with one row
+    per date.
+    """
+    if input_file.endswith('.npz'):
+        # Load only the temperature column from the observation table
+        from frost_observations import load_table
+        obs = load_table(input_file, columns=[temperature_element])
+        df = pd.DataFrame({'date': obs.index.tz_convert(None).normalize(),
+                           'temperature': obs[temperature_element].values})
+    else:
+        df = pd.read_csv(input_file, sep=';', decimal=',')
+        df['date'] = pd.Timestamp(start_date) + pd.to_timedelta(df['date'] - 1, unit='D')
+    df = df.dropna(subset=['temperature'])
+    return df.drop_duplicates(subset='date', keep='last').reset_index(drop=True)
+
+
+def add_trends(df):
+    """
+    Adds the 365-day moving average (trend) and its Savitzky-Golay smoothed
+    version (smooth_trend) to a daily temperature DataFrame. The series is
+    put on a full daily calendar and gaps are bridged by interpolation for
+    both, so a few missing days only leave those days without a trend.
+    """
+    series = complete_daily(df.set_index('date')['temperature'])
+    df = series.rename('temperature').rename_axis('date').reset_index()
+    missing = df['temperature'].isna()
+    filled = df['temperature'].interpolate(limit_area='inside')
+
+    df['month'] = df['date'].dt.month
+    df['year'] = df['date'].dt.year
+
+    # Calculate moving average (365-day window) for trend
+    df['trend'] = filled.rolling(window=window_size, center=True).mean().mask(missing)
+
+    # Apply Savitzky-Golay filter for smoother trend visualization
+    try:
+        from scipy.signal import savgol_filter
+        df['smooth_trend'] = savgol_filter(filled,
+                                           window_length=window_size,
+                                           polyorder=3)
+        df.loc[missing, 'smooth_trend'] = np.nan
+    except:
+        # Fallback if savgol_filter is not available
+        df['smooth_trend'] = df['trend']
+    return df
+
+
+def plot_temperature(dates, temperature, smooth_trend, yearly_avg, title,
+                     output=None):
+    """
+    Plots daily temperature, its trend and the annual averages (a Series
+    indexed by year) in one figure and saves it to output if given.
+    Returns the figure.
+    """
+    # Create figure and axes with better proportions
+    fig, ax = plt.subplots(figsize=(12, 7))
+
+    # Plot temperature data with enhanced aesthetics
+    ax.plot(dates, temperature,
+            linewidth=0.8,
+            color='#1f77b4',
+            alpha=0.7,
+            label='Daglig temperatur')
+
+    # Add trend line
+    ax.plot(dates, smooth_trend,
+            linewidth=2.5,
+            color='#d62728',
+            alpha=0.8,
+            label='Temperaturtrend')
+
+    # Plot annual average temperatures
+    years = [datetime(year, 1, 1) for year in yearly_avg.index]
+    ax.plot(years, yearly_avg.values, 'o-',
+            linewidth=2,
+            color='#2ca02c',
+            markersize=6,
+            markerfacecolor='white',
+            markeredgewidth=2,
+            label='Årlig gjennomsnitt')
+
+    # Format x-axis with cleaner date labels - show fewer years to avoid crowding
+    years = YearLocator(base=5)  # Show every 5 years instead of every year
+    months = MonthLocator(bymonth=[1])  # Only January
+    year_fmt = DateFormatter('%Y')
+
+    ax.xaxis.set_major_locator(years)
+    ax.xaxis.set_major_formatter(year_fmt)
+    ax.xaxis.set_minor_locator(months)
+
+    # Customize the plot with Norwegian text
+    ax.set_xlabel('År', fontsize=12, fontweight='bold', labelpad=10)
+    ax.set_ylabel('Temperatur (°C)', fontsize=12, fontweight='bold', labelpad=10)
+    ax.set_title(title, fontsize=14, fontweight='bold', pad=20)
+
+    # Format axis appearance
+    ax.spines['top'].set_visible(False)
+    ax.spines['right'].set_visible(False)
+    ax.tick_params(axis='x', labelrotation=0)  # Horizontal year labels
+
+    # Add some padding
+    ax.margins(x=0.01)
+
+    # Add legend with better positioning
+    legend = ax.legend(loc='upper right', frameon=True, framealpha=0.9, fontsize=10)
+    legend.get_frame().set_facecolor('white')
+    legend.get_frame().set_edgecolor('lightgray')
+
+    # Add descriptive text about data - updated source
+    fig.text(0.02, 0.02, 'Datakilde: MET',
+             fontsize=8, color='gray', ha='left')
+
+    # Adjust layout
+    fig.tight_layout()
+
+    # Save the plot
+    if output is not None:
+        fig.savefig(output, dpi=300, bbox_inches='tight')
+    return fig
+
+
+if __name__ == "__main__":
+    if observations_file is not None:
+        input_file = observations_file
+    else:
+        # input_file = 'Øygarden_temperature_2015_2025.csv'
+        input_file = 'flesland_daily_average_temperature_from_1995.csv'
+    df = add_trends(read_daily_temperature(input_file, datetime(1995, 1, 1)))
+
+    # Calculate annual average temperatures from the cached seasonal cube
+    cube = cached_cube(os.path.splitext(input_file)[0] + '_cube.npz', input_file,
+                       lambda: SeasonalCube.from_series(df['date'].values, {'temperature': df['temperature'].values}))
+    yearly_avg = cube.yearly('temperature')['mean']
+
+    plot_temperature(df['date'], df['temperature'], df['smooth_trend'],
+                     yearly_avg, 'Temperaturvariasjon i Flesland (1995-2024)',
+                     'temperatur_plot_flesland.png')
+    plt.show()
@@ -1,35 +1,39 @@
-import pandas as pd
-import csv
 import os
+import glob
+import pandas as pd
+from series_quality import (read_met_daily, read_frost_daily, complete_daily,
+                            find_gaps, fill_series, day_numbers, OBSERVED)
 
 # Define input and output file paths
-input_file = "G:/My Drive/GitHub Repos/weather_data_from_yr/Flesland_middeltemperatur_døgn_fra_1995.csv"
-output_file = "G:/My Drive/GitHub Repos/weather_data_from_yr/flesland_daily_average_temperature_from_1995.csv"
+my_dir = os.path.dirname(os.path.abspath(__file__))
+input_file = os.path.join(my_dir, "Flesland_middeltemperatur_døgn_fra_1995.csv")
+output_file = os.path.join(my_dir, "flesland_daily_average_temperature_from_1995.csv")
+
+# Neighbouring station used to fill longer gaps
+neighbour_files = sorted(glob.glob(os.path.join(my_dir, "Øygarden_temperature_20??-??-??_to_*.csv")))
+
+# Read the daily series, skipping the licence line at the end of the file
+series = read_met_daily(input_file)
+
+# Put the series on a full daily calendar so missing days are not skipped
+frame = pd.DataFrame({'temperature': series,
+                      'neighbour': read_frost_daily(neighbour_files)})
+frame = frame.loc[series.index.min():series.index.max()]
+
+# Report gaps, then fill short ones by interpolation and longer ones from
+# the neighbouring station
+gaps = find_gaps(complete_daily(frame[['temperature']]))
+print(f"Found {len(gaps)} gaps, {gaps['length'].sum()} missing days")
+filled, flags = fill_series(frame, neighbours={'temperature': 'neighbour'})
+output = filled[['temperature']].round(1)
+# The thermal model cannot read missing values
+if output['temperature'].isna().any():
+    raise ValueError(f"{output['temperature'].isna().sum()} days could not be filled, "
+                     f"{output_file} was not written")
 
-# Read the input file and write to the output file
-with open(input_file, 'r', encoding='utf-8') as infile, open(output_file, 'w', encoding='utf-8', newline='') as outfile:
-    # Create CSV readers and writers
-    reader = csv.reader(infile, delimiter=';')
-    writer = csv.writer(outfile, delimiter=';')
-    
-    # Skip the header row in the input file
-    next(reader)
-    
-    # Write the header row to the output file
-    writer.writerow(['date', 'temperature'])
-    
-    # Process each row of data
-    day_count = 1
-    for row in reader:
-        # Skip empty rows or rows that appear to be comments or metadata
-        if not row or (len(row) > 0 and (row[0].strip().startswith('//') or 'Data er gyldig' in row[0])):
-            continue
-        
-        if len(row) >= 4:  # Ensure we have enough columns
-            temperature = row[3]  # Get the temperature value (already with comma as decimal)
-            
-            # Write the new row to the output file
-            writer.writerow([day_count, temperature])
-            day_count += 1
+# Number the days from the first date, so that day numbers match the calendar
+output.insert(0, 'date', day_numbers(output.index, output.index[0]))
+output.to_csv(output_file, index=False, sep=';', decimal=',')
 
-print(f"Processing complete. Created {output_file} with {day_count-1} days of temperature data.")
\ No newline at end of file
+print(f"Processing complete. Created {output_file} with {len(output)} days of temperature data, "
+      f"{(flags['temperature'] != OBSERVED).sum()} filled.")
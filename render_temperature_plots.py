@@ -0,0 +1,162 @@
+import os
+import sys
+import time
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import matplotlib.dates as mdates
+from concurrent.futures import ProcessPoolExecutor
+
+from simulation_field import SimulationField, open_field, read_labelled_csv
+
+output_dir = 'temperature_plots'
+# Largest number of time steps and depths drawn in each figure
+max_columns = 2000
+max_surface_columns = 300
+max_surface_rows = 60
+
+
+def decimate(values, axis, limit):
+    """
+    Averages consecutive samples along an axis so that at most limit remain.
+    Trailing samples that do not fill a group are dropped, so the time axis
+    must be decimated the same way.
+    """
+    n = values.shape[axis]
+    step = -(-n // limit)
+    if step <= 1:
+        return values
+    n = n // step * step
+    values = np.take(values, np.arange(n), axis=axis)
+    shape = list(values.shape)
+    shape[axis:axis + 1] = [n // step, step]
+    return np.nanmean(values.reshape(shape), axis=axis + 1)
+
+
+def date_numbers(dates):
+    return mdates.date2num(dates.astype('datetime64[s]').astype(object))
+
+
+def plot_heatmap(path, output):
+    field = SimulationField(path)
+    values = decimate(np.asarray(field.values), 0, max_columns)
+    times = decimate(date_numbers(field.dates), 0, max_columns)
+    order = np.argsort(field.depths)
+
+    fig, ax = plt.subplots(figsize=(12, 5))
+    limit = np.nanmax(np.abs(values))
+    # Cells are drawn at the real depths, so a graded mesh is not distorted
+    # and the 0 °C contour lines up with them
+    image = ax.pcolormesh(times, field.depths[order], values[:, order].T,
+                          cmap='coolwarm', vmin=-limit, vmax=limit,
+                          shading='nearest', rasterized=True)
+    ax.contour(times, field.depths[order], values[:, order].T, levels=[0],
+               colors='k', linewidths=0.5)
+    ax.invert_yaxis()
+    ax.xaxis_date()
+    ax.set_xlabel('Date')
+    ax.set_ylabel('Depth (m)')
+    ax.set_title('Temperature vs depth and time')
+    fig.colorbar(image, ax=ax, label='Temperature (°C)')
+    fig.savefig(output, dpi=200, bbox_inches='tight')
+    plt.close(fig)
+
+
+def plot_surface(path, output):
+    field = SimulationField(path)
+    order = np.argsort(field.depths)
+    values = decimate(np.asarray(field.values)[:, order], 0,
+                      max_surface_columns)
+    stride = -(-len(order) // max_surface_rows)
+    values = values[:, ::stride]
+    depths = field.depths[order][::stride]
+    times = decimate(date_numbers(field.dates), 0, max_surface_columns)
+    t, d = np.meshgrid(times, depths, indexing='ij')
+
+    fig = plt.figure(figsize=(12, 8))
+    ax = fig.add_subplot(projection='3d')
+    ax.plot_surface(t, d, values, cmap='coolwarm', linewidth=0,
+                    antialiased=False, rasterized=True)
+    ax.xaxis.set_major_formatter(mdates.DateFormatter('%Y'))
+    ax.invert_yaxis()
+    ax.set_xlabel('Date')
+    ax.set_ylabel('Depth (m)')
+    ax.set_zlabel('Temperature (°C)')
+    ax.set_title('Temperature surface')
+    fig.savefig(output, dpi=200, bbox_inches='tight')
+    plt.close(fig)
+
+
+def plot_vs_distance(path, output, n_profiles=8):
+    field = SimulationField(path)
+    values = np.asarray(field.values)
+    order = np.argsort(field.depths)
+    depths = field.depths[order]
+
+    fig, ax = plt.subplots(figsize=(8, 8))
+    ax.fill_betweenx(depths, np.nanmin(values, axis=0)[order],
+                     np.nanmax(values, axis=0)[order], color='lightgray',
+                     label='Min-max')
+    # Profiles on evenly spaced days of the last simulated year
+    last_year = np.nonzero(field.dates >= field.dates[-1] - 365)[0]
+    picks = last_year[np.linspace(0, len(last_year) - 1, n_profiles).astype(int)]
+    colors = plt.cm.viridis(np.linspace(0, 1, n_profiles))
+    for i, color in zip(picks, colors):
+        ax.plot(values[i, order], depths, color=color, label=str(field.dates[i]))
+    ax.axvline(0, color='k', linestyle='--', linewidth=0.8)
+    ax.invert_yaxis()
+    ax.set_xlabel('Temperature (°C)')
+    ax.set_ylabel('Depth (m)')
+    ax.set_title('Temperature vs distance')
+    ax.legend(loc='best', fontsize=8)
+    fig.savefig(output, dpi=200, bbox_inches='tight')
+    plt.close(fig)
+
+
+def plot_vs_time(path, output, depths=(0.0, 0.25, 0.5, 1.0, 2.0)):
+    field = SimulationField(path)
+    depths = [d for d in depths if field.depths.min() <= d <= field.depths.max()]
+    values = decimate(field.at_depths(depths), 0, max_columns)
+    times = decimate(date_numbers(field.dates), 0, max_columns)
+
+    fig, ax = plt.subplots(figsize=(12, 5))
+    for depth, series in zip(depths, values.T):
+        ax.plot(times, series, linewidth=0.8, label=f'{depth:.2f} m')
+    ax.axhline(0, color='k', linestyle='--', linewidth=0.8)
+    ax.xaxis_date()
+    ax.set_xlabel('Date')
+    ax.set_ylabel('Temperature (°C)')
+    ax.set_title('Temperature vs time')
+    ax.legend(loc='best')
+    fig.savefig(output, dpi=200, bbox_inches='tight')
+    plt.close(fig)
+
+
+figures = {
+    'temperature_heatmap.png': plot_heatmap,
+    'temperature_3d_surface.png': plot_surface,
+    'temperature_vs_distance.png': plot_vs_distance,
+    'temperature_vs_time.png': plot_vs_time,
+}
+
+
+def render_all(field, directory=output_dir, workers=len(figures)):
+    """
+    Renders the four temperature figures of a field, one per process
+    """
+    os.makedirs(directory, exist_ok=True)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        jobs = {name: pool.submit(plot, field.path, os.path.join(directory, name))
+                for name, plot in figures.items()}
+        for name, job in jobs.items():
+            job.result()
+            print(f"Saved {os.path.join(directory, name)}")
+
+
+if __name__ == "__main__":
+    file_path = sys.argv[1] if len(sys.argv) > 1 else \
+        'temperature_vs_depth_results_oygard_model_concrete_cahnnel_1995-2025.csv'
+    start_time = time.time()
+    render_all(open_field(file_path, read_labelled_csv))
+    print(f"Rendering completed in {time.time() - start_time:.2f} seconds")
@@ -0,0 +1,131 @@
+import os
+import numpy as np
+import pandas as pd
+
+# Statistics held for every variable, year and day
+statistics = ['sum', 'count', 'min', 'max']
+
+
+def calendar_index(dates):
+    """
+    Returns the calendar year and the day of year (0-365) of each date
+    """
+    dates = np.asarray(dates, dtype='datetime64[D]')
+    years = dates.astype('datetime64[Y]')
+    return years.astype(int) + 1970, (dates - years).astype(int)
+
+
+def season_index(dates, first_month=10):
+    """
+    Returns the frost season (labelled by the year it starts in) and the day
+    of season (0-365) of each date, seasons starting on the first of
+    first_month
+    """
+    dates = np.asarray(dates, dtype='datetime64[D]')
+    shifted = dates.astype('datetime64[M]') - np.timedelta64(first_month - 1, 'M')
+    years = shifted.astype('datetime64[Y]')
+    starts = (years + np.timedelta64(first_month - 1, 'M')).astype('datetime64[D]')
+    return years.astype(int) + 1970, (dates - starts).astype(int)
+
+
+class SeasonalCube:
+    """
+    Year x day statistics (sum, count, min, max) of daily variables, indexed
+    both by calendar year and by frost season (October to September)
+    """
+    def __init__(self, arrays):
+        self.arrays = arrays
+
+    @classmethod
+    def from_series(cls, dates, variables):
+        """
+        Builds the cube from dates and a dict of value arrays. Values at
+        the same year and day are combined and NaN values are skipped.
+        """
+        arrays = {}
+        for by, index in [('calendar', calendar_index),
+                          ('season', season_index)]:
+            years, days = index(dates)
+            first = years.min()
+            n_years = years.max() - first + 1
+            arrays[f'{by}/years'] = np.arange(first, first + n_years)
+            cell = (years - first) * 366 + days
+            for name, values in variables.items():
+                values = np.asarray(values, dtype=np.float64)
+                ok = ~np.isnan(values)
+                size = n_years * 366
+                key = f'{by}/{name}'
+                # All statistics of all cells in one pass over the data
+                arrays[key + '/sum'] = np.bincount(
+                    cell[ok], values[ok], minlength=size)
+                arrays[key + '/count'] = np.bincount(
+                    cell[ok], minlength=size).astype(np.float64)
+                low = np.full(size, np.inf)
+                high = np.full(size, -np.inf)
+                np.minimum.at(low, cell[ok], values[ok])
+                np.maximum.at(high, cell[ok], values[ok])
+                arrays[key + '/min'] = low
+                arrays[key + '/max'] = high
+                for stat in statistics:
+                    arrays[key + '/' + stat] = \
+                        arrays[key + '/' + stat].reshape(n_years, 366)
+        return cls(arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as npz:
+            return cls({name: npz[name] for name in npz.files})
+
+    def save(self, path):
+        np.savez(path, **self.arrays)
+
+    def variables(self):
+        return sorted({key.split('/')[1] for key in self.arrays
+                       if key.count('/') == 2})
+
+    def years(self, by='calendar'):
+        return self.arrays[f'{by}/years']
+
+    def daily(self, name, stat='mean', by='calendar'):
+        """
+        Returns a (year, day) array of one statistic, NaN for empty days
+        """
+        key = f'{by}/{name}/'
+        count = self.arrays[key + 'count']
+        with np.errstate(invalid='ignore', divide='ignore'):
+            if stat == 'mean':
+                values = self.arrays[key + 'sum'] / count
+            else:
+                values = self.arrays[key + stat].copy()
+        if stat != 'count':
+            values[count == 0] = np.nan
+        return values
+
+    def yearly(self, name, by='calendar'):
+        """
+        Returns the mean, min, max and count of a variable per year (or per
+        season), skipping years without data
+        """
+        key = f'{by}/{name}/'
+        count = self.arrays[key + 'count'].sum(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            table = pd.DataFrame({
+                'mean': self.arrays[key + 'sum'].sum(axis=1) / count,
+                'min': self.arrays[key + 'min'].min(axis=1),
+                'max': self.arrays[key + 'max'].max(axis=1),
+                'count': count.astype(int),
+            }, index=pd.Index(self.years(by), name=by))
+        return table[table['count'] > 0]
+
+
+def cached_cube(cache_path, source_path, build):
+    """
+    Loads a cube from cache_path, or builds it with build() and caches it
+    if there is no cache or source_path has changed since it was written
+    """
+    if (os.path.exists(cache_path)
+            and os.path.getmtime(cache_path) >= os.path.getmtime(source_path)):
+        return SeasonalCube.load(cache_path)
+    cube = build()
+    cube.save(cache_path)
+    return cube
@@ -0,0 +1,182 @@
+import numpy as np
+import pandas as pd
+
+from frost_exceedance import run_lengths
+
+# Flags of the values in a filled series
+OBSERVED, INTERPOLATED, REGRESSED, CLIMATOLOGY, MISSING = 0, 1, 2, 3, 4
+
+
+def read_met_daily(path):
+    """
+    Reads a daily series exported from seklima.met.no (name, station, date
+    and value separated by semicolons) into a Series indexed by date
+    """
+    df = pd.read_csv(path, sep=';', encoding='utf-8-sig', dtype=str)
+    # Skip the licence line and other rows without a date
+    df = df[df.iloc[:, 2].str.match(r'\d{2}\.\d{2}\.\d{4}$', na=False)]
+    values = pd.to_numeric(df.iloc[:, 3].str.replace(',', '.'),
+                           errors='coerce')
+    index = pd.to_datetime(df.iloc[:, 2], format='%d.%m.%Y')
+    return pd.Series(values.values, index=pd.DatetimeIndex(index, name='date'),
+                     name='temperature')
+
+
+def read_frost_daily(paths):
+    """
+    Reads and concatenates daily series saved by the Frost script
+    (date,temperature) into a Series indexed by date. Where files overlap,
+    the value of the later file is kept.
+    """
+    frames = [pd.read_csv(path, parse_dates=['date']) for path in paths]
+    df = pd.concat(frames).drop_duplicates(subset='date', keep='last') \
+        .sort_values('date')
+    return df.set_index('date')['temperature']
+
+
+def day_numbers(index, start):
+    """
+    Returns the day number of each date counted from start (day 1), as used
+    in the sequential csv files read by plot_temperature.py
+    """
+    return (pd.DatetimeIndex(index) - pd.Timestamp(start)).days + 1
+
+
+def complete_daily(frame, start=None, end=None):
+    """
+    Reindexes daily series (a Series or a date x station DataFrame) onto a
+    full daily calendar, so that missing days become NaN rows
+    """
+    index = pd.DatetimeIndex(frame.index).normalize()
+    frame = frame.set_axis(index)
+    frame = frame[~index.duplicated(keep='last')]
+    calendar = pd.date_range(start or index.min(), end or index.max(),
+                             freq='D', name=frame.index.name or 'date')
+    return frame.reindex(calendar)
+
+
+def find_gaps(frame):
+    """
+    Returns the gaps of daily series as run-length intervals: station,
+    first and last missing day and length
+    """
+    frame = frame.to_frame() if isinstance(frame, pd.Series) else frame
+    rows, starts, ends = run_lengths(frame.isna().values.T)
+    return pd.DataFrame({
+        'station': frame.columns[rows],
+        'start': frame.index[starts],
+        'end': frame.index[ends - 1],
+        'length': ends - starts,
+    })
+
+
+def gap_lengths(frame):
+    """
+    Returns the length of the gap each value belongs to (0 for values that
+    are present), as an array shaped like the frame
+    """
+    missing = frame.isna().values.T
+    rows, starts, ends = run_lengths(missing)
+    # Mark each run by its length at the start and undo it at the end
+    steps = np.zeros((missing.shape[0], missing.shape[1] + 1), dtype=int)
+    np.add.at(steps, (rows, starts), ends - starts)
+    np.add.at(steps, (rows, ends), starts - ends)
+    return np.cumsum(steps, axis=1)[:, :-1].T
+
+
+def fill_short_gaps(frame, max_gap=3):
+    """
+    Fills gaps of at most max_gap days by linear interpolation. Longer gaps
+    and gaps at the ends of a series are left missing.
+    """
+    lengths = gap_lengths(frame)
+    short = (lengths > 0) & (lengths <= max_gap)
+    interpolated = frame.interpolate(limit_area='inside')
+    return frame.mask(short, interpolated)
+
+
+def best_neighbours(frame, min_overlap=365):
+    """
+    Returns for every station the other station its daily values correlate
+    best with, requiring at least min_overlap common days
+    """
+    corr = frame.corr(min_periods=min_overlap).to_numpy(copy=True)
+    np.fill_diagonal(corr, np.nan)
+    neighbours = {}
+    for i, station in enumerate(frame.columns):
+        if not np.all(np.isnan(corr[i])):
+            neighbours[station] = frame.columns[np.nanargmax(corr[i])]
+    return neighbours
+
+
+def regression_fill(target, neighbour, min_overlap=30):
+    """
+    Fills missing values of target from a neighbouring series with a linear
+    regression fitted separately for each calendar month on the days both
+    series have. Returns the filled series.
+    """
+    both = target.notna() & neighbour.notna()
+    month = target.index.month
+    pairs = pd.DataFrame({'x': neighbour[both], 'y': target[both],
+                          'xx': neighbour[both] ** 2,
+                          'xy': neighbour[both] * target[both]})
+    sums = pairs.groupby(month[both]).agg(['sum', 'count'])
+    n = sums[('x', 'count')]
+    sx, sy = sums[('x', 'sum')], sums[('y', 'sum')]
+    sxx, sxy = sums[('xx', 'sum')], sums[('xy', 'sum')]
+    slope = (n * sxy - sx * sy) / (n * sxx - sx ** 2)
+    intercept = (sy - slope * sx) / n
+    fitted = n >= min_overlap
+
+    a = intercept[fitted].reindex(month).values
+    b = slope[fitted].reindex(month).values
+    estimate = pd.Series(a + b * neighbour.values, index=target.index)
+    return target.fillna(estimate)
+
+
+def climatology_fill(target, window=31):
+    """
+    Fills gaps inside a series with its mean seasonal cycle (the mean of
+    each day of the year, smoothed over window days) plus the anomaly
+    interpolated linearly across the gap, so that the fill joins the
+    observed values at both ends. Gaps at the ends are left missing.
+    """
+    day = target.index.dayofyear
+    mean = target.groupby(day).mean().reindex(range(1, 367))
+    # Smooth around the turn of the year by wrapping the cycle
+    wrapped = pd.concat([mean, mean, mean], ignore_index=True)
+    cycle = wrapped.rolling(window, center=True, min_periods=1).mean() \
+        .iloc[366:732].to_numpy()[day - 1]
+    anomaly = (target - cycle).interpolate(limit_area='inside')
+    return target.fillna(anomaly + cycle)
+
+
+def fill_series(frame, max_gap=3, neighbours=None, min_overlap=365):
+    """
+    Completes daily station series: reindexes them onto a full calendar,
+    interpolates short gaps and fills longer gaps from the best correlated
+    neighbouring station, fitted on observed values only. Gaps the
+    neighbour does not cover are filled from the seasonal cycle of the
+    station. Returns the filled frame and a frame of flags (OBSERVED,
+    INTERPOLATED, REGRESSED, CLIMATOLOGY or MISSING).
+    """
+    frame = complete_daily(frame)
+    observed = frame.notna()
+    filled = fill_short_gaps(frame, max_gap)
+    interpolated = filled.notna() & ~observed
+
+    if neighbours is None:
+        neighbours = best_neighbours(frame, min_overlap)
+    for station, neighbour in neighbours.items():
+        if filled[station].isna().any():
+            estimate = regression_fill(frame[station], frame[neighbour])
+            filled[station] = filled[station].fillna(estimate)
+    regressed = filled.notna() & ~observed & ~interpolated
+    filled = filled.apply(climatology_fill)
+
+    flags = pd.DataFrame(MISSING, index=frame.index, columns=frame.columns)
+    flags[filled.notna()] = CLIMATOLOGY
+    flags[regressed] = REGRESSED
+    flags[interpolated] = INTERPOLATED
+    flags[observed] = OBSERVED
+    return filled, flags
@@ -0,0 +1,264 @@
+import io
+import os
+import re
+import json
+import numpy as np
+import pandas as pd
+
+# Encodings tried in turn when reading simulation exports
+encodings = ['latin1', 'cp1252', 'utf-8-sig', 'iso-8859-1']
+# Empty fields of a row, read as NaN
+empty_field = re.compile(r'(?<=;)(?=;|$)', re.M)
+
+
+def parse_time_labels(labels):
+    """
+    Converts time column labels of a simulation export ('1 days', '0,5 yrs'
+    or plain numbers) to days since the start of the simulation
+    """
+    days = []
+    for label in labels:
+        try:
+            label = str(label).strip()
+            if 'days' in label:
+                days.append(float(label.split('days')[0].strip()))
+            elif 'yrs' in label:
+                years = float(label.split('yrs')[0].strip().replace(',', '.'))
+                days.append(years * 365)
+            else:
+                days.append(float(label))
+        except ValueError:
+            days.append(len(days) + 1)
+    return np.array(days)
+
+
+def read_profile_csv(path):
+    """
+    Reads a depth profile export (two header lines, depth in the first
+    column and one temperature column per day). Returns the depths, the
+    days since the start of the simulation and a (time, depth) temperature
+    matrix.
+    """
+    df = pd.read_csv(path, sep=';', encoding='latin1', skiprows=2,
+                     header=None, decimal=',')
+    values = df.values[:, 1:].T
+    return df[0].values, np.arange(values.shape[0]), values
+
+
+def read_labelled_csv(path):
+    """
+    Reads a simulation export with a header row of time labels and the
+    depth (distance) in the first column. Returns the depths, the days
+    since the start of the simulation and a (time, depth) temperature
+    matrix.
+    """
+    df = None
+    for encoding in encodings:
+        try:
+            df = pd.read_csv(path, sep=';', encoding=encoding, dtype=str)
+            break
+        except UnicodeDecodeError:
+            pass
+    if df is None:
+        raise ValueError("Could not read the file with any of the attempted encodings")
+
+    values = df.apply(lambda col: pd.to_numeric(
+        col.str.replace(',', '.'), errors='coerce')).values
+    # Drop rows without a valid depth
+    values = values[~np.isnan(values[:, 0])]
+    return values[:, 0], parse_time_labels(df.columns[1:]), values[:, 1:].T
+
+
+class SimulationField:
+    """
+    Depth x time temperature field stored on disk as a float32 memory map
+    with one row per time step, so that slicing by date reads only the
+    pages of the requested period
+    """
+    def __init__(self, path, mode='r'):
+        self.path = path
+        with open(os.path.join(path, 'meta.json')) as f:
+            self.meta = json.load(f)
+        self.depths = np.load(os.path.join(path, 'depths.npy'))
+        self.dates = np.load(os.path.join(path, 'dates.npy'))
+        self.values = np.memmap(os.path.join(path, 'temperature.f32'),
+                                dtype=np.float32, mode=mode,
+                                shape=tuple(self.meta['shape']))
+
+    @classmethod
+    def create(cls, path, depths, dates):
+        """
+        Creates an empty field on disk and returns it opened for writing
+        """
+        os.makedirs(path, exist_ok=True)
+        dates = np.asarray(dates, dtype='datetime64[D]')
+        depths = np.asarray(depths, dtype=np.float64)
+        shape = (len(dates), len(depths))
+        np.save(os.path.join(path, 'depths.npy'), depths)
+        np.save(os.path.join(path, 'dates.npy'), dates)
+        np.memmap(os.path.join(path, 'temperature.f32'), dtype=np.float32,
+                  mode='w+', shape=shape).flush()
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump({'shape': shape, 'units': 'C', 'complete': False}, f)
+        return cls(path, mode='r+')
+
+    def finish(self):
+        """
+        Flushes a field written after create() and marks it complete, so
+        that an interrupted conversion is redone when the field is opened
+        """
+        self.values.flush()
+        self.meta['complete'] = True
+        with open(os.path.join(self.path, 'meta.json'), 'w') as f:
+            json.dump(self.meta, f)
+
+    @classmethod
+    def from_arrays(cls, path, depths, dates, values):
+        """
+        Writes a (time, depth) matrix to disk and returns it opened for
+        reading
+        """
+        field = cls.create(path, depths, dates)
+        field.values[:] = values
+        field.finish()
+        return cls(path)
+
+    def date_range(self, start=None, end=None):
+        """
+        Returns the slice of time steps between two dates (inclusive)
+        """
+        lo = 0 if start is None else np.searchsorted(
+            self.dates, np.datetime64(start, 'D'), side='left')
+        hi = len(self.dates) if end is None else np.searchsorted(
+            self.dates, np.datetime64(end, 'D'), side='right')
+        return slice(lo, hi)
+
+    def depth_range(self, min_depth=None, max_depth=None):
+        """
+        Returns a boolean mask of the depths within [min_depth, max_depth]
+        """
+        mask = np.ones(len(self.depths), dtype=bool)
+        if min_depth is not None:
+            mask &= self.depths >= min_depth
+        if max_depth is not None:
+            mask &= self.depths <= max_depth
+        return mask
+
+    def select(self, start=None, end=None, min_depth=None, max_depth=None):
+        """
+        Returns the dates, depths and temperatures of a date and depth range
+        """
+        rows = self.date_range(start, end)
+        cols = self.depth_range(min_depth, max_depth)
+        return self.dates[rows], self.depths[cols], self.values[rows][:, cols]
+
+    def at_depths(self, depths, start=None, end=None):
+        """
+        Returns temperatures linearly interpolated at the given depths for a
+        date range, as a (time, depth) array
+        """
+        rows = self.date_range(start, end)
+        grid = self.depths
+        order = np.argsort(grid)
+        grid = grid[order]
+        depths = np.atleast_1d(np.asarray(depths, dtype=np.float64))
+        hi = np.clip(np.searchsorted(grid, depths), 1, len(grid) - 1)
+        lo = hi - 1
+        weight = np.clip((depths - grid[lo]) / (grid[hi] - grid[lo]), 0, 1)
+        block = self.values[rows]
+        return ((1 - weight) * block[:, order[lo]]
+                + weight * block[:, order[hi]])
+
+    def series(self, depth, start=None, end=None):
+        """
+        Returns the dates and the temperature at one (interpolated) depth
+        """
+        rows = self.date_range(start, end)
+        return self.dates[rows], self.at_depths([depth], start, end)[:, 0]
+
+
+def convert_csv_blocked(csv_path, path, reader=read_profile_csv,
+                        start_date='1995-01-01', memory_mb=256):
+    """
+    Converts a simulation export to binary form without loading it at once.
+    A first pass reads the depth of every row; the second parses as many
+    depth rows at a time as fit in about memory_mb of parsing memory,
+    straight to float32, and writes them transposed into the field, so
+    that memory use does not grow with the length of the simulation.
+    """
+    def number(text):
+        try:
+            return float(text.strip().replace(',', '.'))
+        except ValueError:
+            return np.nan
+
+    skip = 1 if reader is read_labelled_csv else 2
+    depths, n_columns, longest = [], 0, 1
+    with open(csv_path, encoding='latin1') as f:
+        header = [f.readline() for _ in range(skip)]
+        for line in f:
+            n_columns = n_columns or line.count(';') + 1
+            longest = max(longest, len(line))
+            depths.append(number(line.split(';', 1)[0]))
+    depths = np.array(depths)
+    valid = ~np.isnan(depths)
+
+    if reader is read_labelled_csv:
+        days = parse_time_labels(header[0].rstrip('\n').split(';')[1:])
+    else:
+        days = np.arange(n_columns - 1)
+    dates = (np.datetime64(start_date, 'D')
+             + np.asarray(days).astype('timedelta64[D]'))
+    field = SimulationField.create(path, depths[valid], dates)
+
+    # The text of a row, its parsed copy and the float32 values take about
+    # six times the length of the row
+    rows = max(1, int(memory_mb * 2 ** 20 // (6 * longest)))
+    n_chunks = (valid.sum() + rows - 1) // rows
+
+    def write(lines, lo):
+        text = empty_field.sub('nan', ''.join(lines).replace(',', '.'))
+        values = np.loadtxt(io.StringIO(text), delimiter=';',
+                            dtype=np.float32, ndmin=2)
+        field.values[:, lo:lo + len(values)] = values[:, 1:].T
+        print(f"Chunk {lo // rows + 1}/{n_chunks} converted")
+        return lo + len(values)
+
+    lo, lines = 0, []
+    with open(csv_path, encoding='latin1') as f:
+        for _ in range(skip):
+            f.readline()
+        for line, ok in zip(f, valid):
+            if ok:
+                lines.append(line)
+            if len(lines) == rows:
+                lo, lines = write(lines, lo), []
+    if lines:
+        write(lines, lo)
+    field.finish()
+    return SimulationField(path)
+
+
+def open_field(csv_path, reader=read_profile_csv, start_date='1995-01-01',
+               memory_mb=None):
+    """
+    Opens the binary form of a simulation export, converting the csv file
+    the first time or whenever the csv file is newer than its binary form.
+    Time steps are placed on the dates start_date + days. With a memory_mb
+    the export is converted in chunks of depth rows that fit in about that
+    much memory.
+    """
+    path = os.path.splitext(csv_path)[0] + '.field'
+    meta = os.path.join(path, 'meta.json')
+    if (not os.path.exists(meta)
+            or os.path.getmtime(meta) < os.path.getmtime(csv_path)
+            or not SimulationField(path).meta.get('complete', True)):
+        print(f"Converting {csv_path} to binary form...")
+        if memory_mb is not None:
+            return convert_csv_blocked(csv_path, path, reader, start_date,
+                                       memory_mb)
+        depths, days, values = reader(csv_path)
+        dates = (np.datetime64(start_date, 'D')
+                 + np.asarray(days).astype('timedelta64[D]'))
+        return SimulationField.from_arrays(path, depths, dates, values)
+    return SimulationField(path)
@@ -0,0 +1,217 @@
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+from scipy.signal import savgol_filter
+from concurrent.futures import ProcessPoolExecutor
+
+from plot_temperature import read_daily_temperature, plot_temperature, window_size
+from series_quality import complete_daily
+
+output_dir = 'temperature_report'
+# Days a year needs to get an annual mean
+min_days_per_year = 330
+
+
+def read_manifest(manifest_file):
+    """
+    Reads a station manifest: a csv file with name, file and start_date
+    (the date of day 1 in the file, ignored for observation tables)
+    columns and an optional title column
+    """
+    manifest = pd.read_csv(manifest_file, dtype=str)
+    if 'title' not in manifest:
+        manifest['title'] = None
+    return manifest
+
+
+def load_stations(manifest):
+    """
+    Reads the daily series of all stations in a manifest and aligns them on
+    one daily calendar, one column per station
+    """
+    columns = {}
+    for station in manifest.itertuples():
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            station.file)
+        df = read_daily_temperature(path, station.start_date)
+        columns[station.name] = df.set_index('date')['temperature']
+    return complete_daily(pd.DataFrame(columns))
+
+
+def rolling_trend(values, window=window_size):
+    """
+    Returns the centred moving average of every column of a (day, station)
+    array, NaN where the window is not complete
+    """
+    ok = ~np.isnan(values)
+    padded = np.zeros((len(values) + 1, values.shape[1]))
+    counts = np.zeros_like(padded)
+    np.cumsum(np.where(ok, values, 0), axis=0, out=padded[1:])
+    np.cumsum(ok, axis=0, out=counts[1:])
+    trend = np.full(values.shape, np.nan)
+    half = window // 2
+    with np.errstate(invalid='ignore'):
+        total = padded[window:] - padded[:-window]
+        count = counts[window:] - counts[:-window]
+        trend[half:half + len(total)] = np.where(count == window,
+                                                 total / window, np.nan)
+    return trend
+
+
+def smooth_trend(values, window=window_size, polyorder=3):
+    """
+    Returns the Savitzky-Golay smoothed series of every column of a (day,
+    station) array. Gaps are bridged by interpolation for the filter and
+    left NaN in the result, as are days outside a station's record.
+    """
+    frame = pd.DataFrame(values)
+    filled = frame.interpolate(limit_area='inside')
+    smooth = np.full(values.shape, np.nan)
+    for i in range(values.shape[1]):
+        column = filled[i].to_numpy()
+        valid = np.flatnonzero(~np.isnan(column))
+        if len(valid) < window:
+            continue
+        lo, hi = valid[0], valid[-1] + 1
+        smooth[lo:hi, i] = savgol_filter(column[lo:hi], window_length=window,
+                                         polyorder=polyorder)
+    smooth[np.isnan(values)] = np.nan
+    return smooth
+
+
+def annual_means(temperatures, min_days=min_days_per_year):
+    """
+    Returns the mean temperature of each calendar year and station, NaN
+    for years with fewer than min_days values
+    """
+    years = temperatures.index.year
+    means = temperatures.groupby(years).mean()
+    counts = temperatures.notna().groupby(years).sum()
+    return means.where(counts >= min_days)
+
+
+def decadal_trends(annual):
+    """
+    Fits a straight line to the annual means of every station at once and
+    returns the warming trend per decade with its standard error
+    """
+    y = annual.to_numpy(dtype=np.float64)
+    ok = ~np.isnan(y)
+    x = np.where(ok, annual.index.to_numpy(dtype=np.float64)[:, None], 0)
+    y = np.where(ok, y, 0)
+    n = ok.sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mx, my = x.sum(axis=0) / n, y.sum(axis=0) / n
+        dx = np.where(ok, x - mx, 0)
+        dy = np.where(ok, y - my, 0)
+        sxx = (dx ** 2).sum(axis=0)
+        slope = (dx * dy).sum(axis=0) / sxx
+        residual = np.where(ok, dy - slope * dx, 0)
+        stderr = np.sqrt((residual ** 2).sum(axis=0) / (n - 2) / sxx)
+    first = annual.apply(lambda c: c.first_valid_index())
+    last = annual.apply(lambda c: c.last_valid_index())
+    return pd.DataFrame({
+        'Station': annual.columns,
+        'Years': n,
+        'First year': first.values,
+        'Last year': last.values,
+        'Mean (C)': my,
+        'Trend (C/decade)': 10 * slope,
+        'Std. error (C/decade)': 10 * stderr,
+    })
+
+
+def compute_report(temperatures):
+    """
+    Computes the trends, smoothed series and annual means of all stations
+    of an aligned (day, station) DataFrame
+    """
+    values = temperatures.to_numpy(dtype=np.float64)
+    annual = annual_means(temperatures)
+    return {
+        'temperature': temperatures,
+        'trend': pd.DataFrame(rolling_trend(values), index=temperatures.index,
+                              columns=temperatures.columns),
+        'smooth_trend': pd.DataFrame(smooth_trend(values),
+                                     index=temperatures.index,
+                                     columns=temperatures.columns),
+        'annual': annual,
+        'trends': decadal_trends(annual),
+    }
+
+
+def render_station(name, title, dates, temperature, smooth, annual, output):
+    valid = ~np.isnan(temperature)
+    first, last = dates[valid][[0, -1]].year
+    title = title or f'Temperaturvariasjon i {name} ({first}-{last})'
+    fig = plot_temperature(dates, temperature, smooth, annual.dropna(),
+                           title, output)
+    plt.close(fig)
+    return output
+
+
+def render_comparison(trend, annual, output):
+    fig, (ax0, ax1) = plt.subplots(2, 1, figsize=(12, 9), sharex=True)
+    for i, name in enumerate(annual.columns):
+        color = f'C{i}'
+        ax0.plot(trend.index, trend[name], color=color, linewidth=2,
+                 label=name)
+        years = pd.to_datetime([f'{y}-07-01' for y in annual.index])
+        ax1.plot(years, annual[name], 'o-', color=color,
+                 markerfacecolor='white', label=name)
+    ax0.set_ylabel('Glidende gjennomsnitt, 365 dager (°C)')
+    ax1.set_ylabel('Årlig gjennomsnitt (°C)')
+    ax1.set_xlabel('År')
+    ax0.set_title('Temperaturvariasjon, alle stasjoner')
+    for ax in (ax0, ax1):
+        ax.spines['top'].set_visible(False)
+        ax.spines['right'].set_visible(False)
+        ax.legend(loc='upper left', fontsize=9)
+    fig.tight_layout()
+    fig.savefig(output, dpi=300, bbox_inches='tight')
+    plt.close(fig)
+    return output
+
+
+def render_report(manifest, report, directory=output_dir, workers=None):
+    """
+    Renders one figure per station and a comparison figure in parallel
+    processes and writes the trend table
+    """
+    os.makedirs(directory, exist_ok=True)
+    dates = report['temperature'].index
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        jobs = [pool.submit(render_comparison, report['trend'],
+                            report['annual'],
+                            os.path.join(directory, 'temperature_comparison.png'))]
+        for station in manifest.itertuples():
+            jobs.append(pool.submit(
+                render_station, station.name,
+                station.title if isinstance(station.title, str) else None,
+                dates, report['temperature'][station.name].to_numpy(),
+                report['smooth_trend'][station.name].to_numpy(),
+                report['annual'][station.name],
+                os.path.join(directory, f'temperature_{station.name}.png')))
+        for job in jobs:
+            print(f"Saved {job.result()}")
+    table_file = os.path.join(directory, 'temperature_trends.csv')
+    report['trends'].to_csv(table_file, index=False)
+    print(f"Saved {table_file}")
+
+
+if __name__ == "__main__":
+    manifest_file = sys.argv[1] if len(sys.argv) > 1 else 'stations.csv'
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else None
+
+    start_time = time.time()
+    manifest = read_manifest(manifest_file)
+    report = compute_report(load_stations(manifest))
+    print("Linear warming trend of the annual mean temperature:")
+    print(report['trends'].round(3).to_string(index=False))
+    render_report(manifest, report, workers=workers)
+    print(f"Report completed in {time.time() - start_time:.2f} seconds")
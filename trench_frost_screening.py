@@ -0,0 +1,375 @@
+import sys
+import time
+import itertools
+import numpy as np
+import pandas as pd
+from multiprocessing import shared_memory
+from concurrent.futures import ProcessPoolExecutor
+
+from find_coordinates_trench import dimensions
+from frost_exceedance import frost_depths
+from seasonal_cube import season_index
+from extreme_values import l_moments, fit_gumbel, quantiles
+from temperature_report import read_manifest, load_stations
+
+# Trench parameters screened by default (m)
+parameter_grid = {
+    'Depth_of_pipe': [0.6, 0.8, 1.0, 1.2, 1.4, 1.6],
+    'Thickness_of_insulation': [0.0, 0.05, 0.1, 0.15],
+    'Width_of_insulation': [0.8, 1.2, 1.6, 2.4],
+    'Asphalt_thickness': [0.1, 0.14, 0.2],
+}
+
+# Thermal properties: conductivity frozen/unfrozen (W/mK), volumetric heat
+# capacity frozen/unfrozen (J/m3K) and volumetric water content
+materials = {
+    'asphalt': {'k_f': 1.0, 'k_u': 1.0, 'c_f': 1.9e6, 'c_u': 1.9e6, 'water': 0.0},
+    'backfill': {'k_f': 1.9, 'k_u': 1.5, 'c_f': 1.7e6, 'c_u': 2.0e6, 'water': 0.08},
+    'insulation': {'k_f': 0.035, 'k_u': 0.035, 'c_f': 0.05e6, 'c_u': 0.05e6, 'water': 0.0},
+    'soil': {'k_f': 1.8, 'k_u': 1.4, 'c_f': 2.0e6, 'c_u': 2.5e6, 'water': 0.25},
+}
+latent_heat = 334e3 * 1000  # J/m3 of water
+# Temperature interval over which the water freezes (C)
+freezing_range = 0.5
+# Heat transfer coefficient between air and a snow free surface (W/m2K)
+surface_transfer = 20.0
+# Time steps per day
+substeps = 2
+# Lower bound of the share of the insulation's resistance that is kept
+# when frost reaches around the edges of a narrow board
+min_edge_factor = 0.25
+
+# Cell edges: fine in the top 2.5 m where frost and the trench layers are
+cell_edges = np.concatenate([np.arange(0, 2.5, 0.02),
+                             np.arange(2.5, dimensions['Height'] + 1e-9, 0.1)])
+cell_depths = (cell_edges[:-1] + cell_edges[1:]) / 2
+
+# Climate shared with the worker processes
+climate = None
+climate_memory = None
+
+
+def layer_depths(design):
+    """
+    Returns the (material, top, bottom) layers of the column through the
+    middle of the trench for a design, depths in meters below the surface.
+    The insulation sits Distance_b_n_insulation_and_pipe above the top of
+    the pipe, the pipe on the cushion at the bottom of the trench.
+    """
+    pipe = design['Depth_of_pipe']
+    insulation_bottom = pipe - dimensions['Distance_b_n_insulation_and_pipe']
+    insulation_top = insulation_bottom - design['Thickness_of_insulation']
+    trench_bottom = pipe + dimensions['Pipe_diameter'] + dimensions['Cushion_thickness']
+    return [('asphalt', 0.0, design['Asphalt_thickness']),
+            ('backfill', design['Asphalt_thickness'], insulation_top),
+            ('insulation', insulation_top, insulation_bottom),
+            ('backfill', insulation_bottom, trench_bottom),
+            ('soil', trench_bottom, dimensions['Height'])]
+
+
+def design_grid(grid=parameter_grid):
+    """
+    Returns all combinations of the grid as a DataFrame, without designs
+    where the insulation would not fit between asphalt and pipe
+    """
+    designs = pd.DataFrame(list(itertools.product(*grid.values())),
+                           columns=list(grid))
+    insulation_top = (designs['Depth_of_pipe']
+                      - dimensions['Distance_b_n_insulation_and_pipe']
+                      - designs['Thickness_of_insulation'])
+    return designs[insulation_top >= designs['Asphalt_thickness']] \
+        .reset_index(drop=True)
+
+
+def edge_factor(design):
+    """
+    Returns the share of the insulation's thermal resistance kept in the
+    middle of the trench. Frost can pass around the edges of the board
+    instead of through it; that path is longer than the direct one by half
+    the width of the board, so the factor is the ratio of that half width
+    to the half width plus the depth of the underside of the board. It is
+    bounded to [min_edge_factor, 1].
+    """
+    half_width = design['Width_of_insulation'] / 2
+    bottom = design['Depth_of_pipe'] - dimensions['Distance_b_n_insulation_and_pipe']
+    return np.clip(half_width / (half_width + bottom), min_edge_factor, 1.0)
+
+
+def cell_properties(designs):
+    """
+    Returns the thermal resistance (frozen, unfrozen), heat capacity
+    (frozen, unfrozen) and latent heat of every cell of every design,
+    arrays shaped (designs, cells). Cells cut by a layer boundary get the
+    series resistance and summed capacity of their parts.
+
+    The insulation is in series with the other layers; frost reaching
+    around its edges is approximated by scaling its resistance with
+    edge_factor().
+    """
+    n = len(cell_depths)
+    dz = np.diff(cell_edges)
+    names = ['r_f', 'r_u', 'c_f', 'c_u', 'latent']
+    props = {name: np.zeros((len(designs), n)) for name in names}
+    for i, design in enumerate(designs.to_dict('records')):
+        for material, top, bottom in layer_depths(design):
+            part = np.clip(np.minimum(cell_edges[1:], bottom)
+                           - np.maximum(cell_edges[:-1], top), 0, None)
+            m = materials[material]
+            edge = edge_factor(design) if material == 'insulation' else 1.0
+            props['r_f'][i] += edge * part / m['k_f']
+            props['r_u'][i] += edge * part / m['k_u']
+            props['c_f'][i] += part / dz * m['c_f']
+            props['c_u'][i] += part / dz * m['c_u']
+            props['latent'][i] += part / dz * m['water'] * latent_heat
+    return props
+
+
+def enthalpy(t, c_f, c_u, latent):
+    """
+    Returns the volumetric enthalpy (J/m3, 0 at -freezing_range) of cells
+    at temperature t, the latent heat released evenly over the freezing
+    range
+    """
+    c_mid = c_f + latent / freezing_range
+    return np.where(t < -freezing_range, c_f * (t + freezing_range),
+                    np.where(t < 0, c_mid * (t + freezing_range),
+                             latent + c_f * freezing_range + c_u * t))
+
+
+def temperature(h, c_f, c_u, latent):
+    """
+    Inverse of enthalpy()
+    """
+    c_mid = c_f + latent / freezing_range
+    h0 = latent + c_f * freezing_range
+    return np.where(h < 0, h / c_f - freezing_range,
+                    np.where(h < h0, h / c_mid - freezing_range,
+                             (h - h0) / c_u))
+
+
+def shifted(x, s, fill):
+    """
+    Returns x moved s places along the last axis (values from index i - s
+    for s > 0, from i + |s| for s < 0), padded with fill
+    """
+    out = np.full_like(x, fill)
+    if s > 0:
+        out[:, s:] = x[:, :-s]
+    else:
+        out[:, :s] = x[:, -s:]
+    return out
+
+
+def solve_tridiagonal(lower, diagonal, upper, rhs):
+    """
+    Solves a batch of tridiagonal systems, one per row of the (batch, n)
+    arrays, by parallel cyclic reduction: every step eliminates the
+    couplings at distance s from all equations at once, so the work is
+    vectorized over both the batch and the cells in log2(n) steps
+    """
+    a, b, c, d = lower, diagonal, upper, rhs
+    s = 1
+    while s < b.shape[1]:
+        alpha = -a / shifted(b, s, 1.0)
+        gamma = -c / shifted(b, -s, 1.0)
+        b = b + alpha * shifted(c, s, 0.0) + gamma * shifted(a, -s, 0.0)
+        d = d + alpha * shifted(d, s, 0.0) + gamma * shifted(d, -s, 0.0)
+        a = alpha * shifted(a, s, 0.0)
+        c = gamma * shifted(c, -s, 0.0)
+        s *= 2
+    return d / b
+
+
+def simulate(air, props, bottom_temperature, spin_up=365):
+    """
+    Runs the implicit 1D heat conduction model with phase change for a
+    batch of designs driven by daily mean air temperatures. Returns the
+    daily frost depth of every design, shape (days, designs).
+
+    Each step is solved with the heat capacity of the previous temperature
+    and the result corrected through the enthalpy, so the latent heat is
+    conserved even when a cell freezes within one step.
+    """
+    dz = np.diff(cell_edges)
+    dt = 86400 / substeps
+    c_f, c_u, latent = props['c_f'], props['c_u'], props['latent']
+    m, n = c_f.shape
+    t = np.full((m, n), bottom_temperature)
+    h = enthalpy(t, c_f, c_u, latent)
+    frost = np.empty((len(air), m))
+
+    # Run the first year once before recording, so the ground is not
+    # started at the annual mean
+    forcing = np.concatenate([air[:spin_up], air])
+    for day, t_air in enumerate(forcing):
+        for _ in range(substeps):
+            frozen = np.clip(-t / freezing_range, 0, 1)
+            r = props['r_u'] + frozen * (props['r_f'] - props['r_u'])
+            conductance = 1 / (r[:, :-1] / 2 + r[:, 1:] / 2)
+            top = 1 / (1 / surface_transfer + r[:, 0] / 2)
+            bottom = 1 / (r[:, -1] / 2)
+            capacity = np.where((t >= -freezing_range) & (t < 0),
+                                c_f + latent / freezing_range,
+                                np.where(t < 0, c_f, c_u)) * dz / dt
+
+            lower = np.zeros((m, n))
+            upper = np.zeros((m, n))
+            lower[:, 1:] = -conductance
+            upper[:, :-1] = -conductance
+            diagonal = capacity.copy()
+            diagonal[:, :-1] += conductance
+            diagonal[:, 1:] += conductance
+            diagonal[:, 0] += top
+            diagonal[:, -1] += bottom
+            rhs = capacity * t
+            rhs[:, 0] += top * t_air
+            rhs[:, -1] += bottom * bottom_temperature
+
+            new = solve_tridiagonal(lower, diagonal, upper, rhs)
+            h = h + capacity * dt / dz * (new - t)
+            t = temperature(h, c_f, c_u, latent)
+        if day >= spin_up:
+            frost[day - spin_up] = frost_depths(t, cell_depths)
+    return frost
+
+
+def steady_frost_depth(props, t_air, bottom_temperature, iterations=100):
+    """
+    Returns the steady state frost depth of every design under a constant
+    air temperature: the temperature falls linearly with the resistance
+    from the air to the bottom, cells using the resistance of their frozen
+    share, which is found by fixed point iteration
+    """
+    r = props['r_u']
+    for _ in range(iterations):
+        total = 1 / surface_transfer + r.sum(axis=1, keepdims=True)
+        to_centre = 1 / surface_transfer + np.cumsum(r, axis=1) - r / 2
+        t = t_air + (bottom_temperature - t_air) * to_centre / total
+        frozen = np.clip(-t / freezing_range, 0, 1)
+        r = props['r_u'] + frozen * (props['r_f'] - props['r_u'])
+    return frost_depths(t, cell_depths)
+
+
+def insulated_check(t_air=-2.0, bottom_temperature=4.0, days=3000,
+                    tolerance=0.03):
+    """
+    Checks the model against the steady state of the default trench of
+    find_coordinates_trench.py with and without its insulation, under a
+    constant air temperature held for days. Returns a table with the
+    simulated and the analytic frost depth per case.
+    """
+    design = {name: dimensions[name] for name in parameter_grid}
+    designs = pd.DataFrame([dict(design, Thickness_of_insulation=0.0), design])
+    props = cell_properties(designs)
+    simulated = simulate(np.full(days, t_air), props, bottom_temperature)[-1]
+    expected = steady_frost_depth(props, t_air, bottom_temperature)
+    table = designs.copy()
+    table['Simulated (m)'] = simulated
+    table['Steady state (m)'] = expected
+    table['ok'] = np.abs(simulated - expected) <= tolerance
+    return table
+
+
+def attach_climate(name, shape):
+    global climate, climate_memory
+    climate_memory = shared_memory.SharedMemory(name=name)
+    climate = np.ndarray(shape, dtype=np.float64, buffer=climate_memory.buf)
+
+
+def screen_block(station, lo, hi, designs, dates):
+    """
+    Simulates one block of designs at one station and returns exceedance
+    days, seasons with exceedance, maximum frost depth and a Gumbel 50-year
+    frost depth per design
+    """
+    air = climate[:, station]
+    valid = ~np.isnan(air)
+    air, dates = air[valid], dates[valid]
+    props = cell_properties(designs)
+    frost = simulate(air, props, np.mean(air))
+
+    pipe = designs['Depth_of_pipe'].to_numpy()
+    exceeded = np.nan_to_num(frost, nan=0) >= pipe
+    years, _ = season_index(dates)
+    seasons = pd.DataFrame(np.nan_to_num(frost, nan=0)).groupby(years).max()
+    seasons = seasons[pd.Series(years).value_counts().sort_index() >= 300]
+    loc, scale, k = fit_gumbel(*l_moments(seasons.to_numpy()))
+    max_depth = np.nanmax(np.nan_to_num(frost, nan=0), axis=0)
+    return lo, hi, {
+        'Exceedance days': exceeded.sum(axis=0),
+        'Seasons exceeded': (seasons.to_numpy() >= pipe).sum(axis=0),
+        'Seasons': len(seasons),
+        'Max frost depth (m)': max_depth,
+        'Margin to pipe (m)': pipe - max_depth,
+        '50-year frost depth (m)': quantiles(loc, scale, k, [1 - 1 / 50])[0],
+    }
+
+
+def screen(designs, temperatures, workers=None, block_size=64):
+    """
+    Screens every design against every station series of a (day, station)
+    DataFrame in a process pool. The climate is put in shared memory once
+    and the workers simulate blocks of designs in one batch. Returns one
+    row per design and station, ranked by exceedance days, then by the
+    margin between the deepest frost and the pipe.
+    """
+    values = np.ascontiguousarray(temperatures.to_numpy(dtype=np.float64))
+    memory = shared_memory.SharedMemory(create=True, size=values.nbytes)
+    np.ndarray(values.shape, dtype=np.float64, buffer=memory.buf)[:] = values
+    dates = temperatures.index.values
+
+    tables = []
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=attach_climate,
+                                 initargs=(memory.name, values.shape)) as pool:
+            jobs = {}
+            for s, station in enumerate(temperatures.columns):
+                for lo in range(0, len(designs), block_size):
+                    hi = min(lo + block_size, len(designs))
+                    job = pool.submit(screen_block, s, lo, hi,
+                                      designs.iloc[lo:hi], dates)
+                    jobs[job] = station
+            start = time.time()
+            for i, job in enumerate(jobs):
+                lo, hi, result = job.result()
+                table = designs.iloc[lo:hi].copy()
+                table.insert(0, 'Station', jobs[job])
+                for column, value in result.items():
+                    table[column] = value
+                tables.append(table)
+                print(f"Block {i + 1}/{len(jobs)} done ({time.time() - start:.1f} s)")
+    finally:
+        memory.close()
+        memory.unlink()
+
+    table = pd.concat(tables, ignore_index=True)
+    return table.sort_values(['Exceedance days', 'Margin to pipe (m)'],
+                             ascending=[True, False], ignore_index=True)
+
+
+if __name__ == "__main__":
+    manifest_file = sys.argv[1] if len(sys.argv) > 1 else 'stations.csv'
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else None
+
+    start_time = time.time()
+    check = insulated_check()
+    print("Frost depth of the default trench at steady state:")
+    print(check.round(3).to_string(index=False))
+    if not check['ok'].all():
+        sys.exit("The frost model does not reproduce the steady state")
+    temperatures = load_stations(read_manifest(manifest_file))
+    # Bridge gaps inside each record; days outside it stay NaN
+    temperatures = temperatures.interpolate(limit_area='inside')
+    designs = design_grid()
+    print(f"Screening {len(designs)} designs at {temperatures.shape[1]} stations")
+    results = screen(designs, temperatures, workers)
+    results.round(3).to_csv('trench_frost_screening.csv', index=False)
+
+    # Shallowest and thinnest designs first, as they are the cheapest
+    print("\nDesigns without frost at the pipe, all stations:")
+    safe = results.groupby(list(parameter_grid))['Exceedance days'].max()
+    safe = safe[safe == 0].reset_index()
+    print(safe.head(20).to_string(index=False))
+    print("\nRanked designs:")
+    print(results.head(20).round(3).to_string(index=False))
+    print(f"Screening completed in {time.time() - start_time:.2f} seconds")